@@ -0,0 +1,234 @@
+import sys
+import os
+import glob
+import time
+import json
+import argparse
+import functools
+import multiprocessing
+
+# custom library
+from solver import Solver, load_puzzle, MODES, AUTO
+from instrumentation import Instrument, TraceWriter
+from solution_cache import open_cache, CACHE_PATH
+from collection import open_collection, is_collection
+try:
+    import batch_propagation
+except ImportError: # numpy isn't installed, --vectorized isn't available
+    batch_propagation = None
+
+DEFAULT_BATCH_SIZE = 1000 # puzzles a worker propagates together with --vectorized
+
+
+# Expands directories, glob patterns, collections and list files into a list of puzzles.
+# A puzzle is a file path, or (collection path, index) for a puzzle in a packed collection.
+def find_puzzles(inputs, list_files = ()):
+    paths = []
+
+    # a collection is opened up into its puzzles however it was named
+    def add_path(path):
+        if is_collection(path):
+            paths.extend([(path, index) for index in range(len(open_collection(path)))])
+        else:
+            paths.append(path)
+
+    for entry in inputs:
+        if os.path.isdir(entry):
+            paths.extend(sorted(glob.glob(os.path.join(entry, '*.txt'))))
+        elif glob.has_magic(entry):
+            for path in sorted(glob.glob(entry)):
+                add_path(path)
+        else:
+            add_path(entry)
+
+    # list files hold one puzzle path per line, relative to the list file
+    for list_file in list_files:
+        base = os.path.dirname(list_file)
+        file = open(list_file, 'r')
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                add_path(os.path.join(base, line))
+        file.close()
+
+    return paths
+
+# Returns a puzzle found by find_puzzles as a list of lists of strings
+def load_entry(entry):
+    if isinstance(entry, tuple):
+        return open_collection(entry[0])[entry[1]]
+    return load_puzzle(entry)
+
+# Returns the name of a puzzle found by find_puzzles, collection puzzles are named path:index
+def entry_name(entry):
+    if isinstance(entry, tuple):
+        return '%s:%d' % entry
+    return entry
+
+# Starts the result record of a puzzle, returns (record, grid) with grid None if it couldn't be loaded
+def load_record(path):
+    record = {'puzzle': entry_name(path)}
+    try:
+        if isinstance(path, tuple):
+            # one read gives both the name and the grid
+            collection = open_collection(path[0])
+            record['name'], grid, end = collection.read(collection.offset(path[1]))
+        else:
+            grid = load_puzzle(path)
+    except (OSError, ValueError, IndexError) as error:
+        record['error'] = str(error)
+        return record, None
+    return record, grid
+
+# Looks a puzzle (or a symmetry of one) up in the cache, returns True and fills in the record if it was there
+def cached_record(record, grid, cache):
+    start = time.perf_counter()
+    solved_board = cache.get(grid)
+    if solved_board == None:
+        return False
+    record['time'] = round(time.perf_counter() - start, 6)
+    record['solved'] = True
+    record['solution'] = [''.join(row) for row in solved_board]
+    record['iterations'] = 0
+    record['cached'] = True
+    return True
+
+# Solves one puzzle and returns its result record (runs in a worker process)
+def solve_file(path, mode = AUTO, check_unique = False, stats = False, trace_directory = None, cache_path = None):
+    record, grid = load_record(path)
+    if grid == None:
+        return record
+
+    # a puzzle solved before is taken from the cache, unless the solve itself is wanted
+    cache = open_cache(cache_path) if cache_path != None else None
+    if cache != None and not (check_unique or stats or trace_directory != None):
+        if cached_record(record, grid, cache):
+            return record
+
+    # the instrument is only created when asked for, so plain runs don't pay for it
+    instrument = None
+    trace = None
+    if trace_directory != None:
+        # collection puzzles get one trace each, named collection-index
+        if isinstance(path, tuple):
+            trace_name = '%s-%d' % (os.path.splitext(os.path.basename(path[0]))[0], path[1])
+        else:
+            trace_name = os.path.splitext(os.path.basename(path))[0]
+        trace = TraceWriter(os.path.join(trace_directory, trace_name + '.trace'))
+        instrument = Instrument(trace)
+    elif stats:
+        instrument = Instrument()
+
+    start = time.perf_counter()
+    solver = Solver(grid, mode = mode, solution_limit = 2 if check_unique else 1, instrument = instrument)
+    solved_board = solver.run()
+    record['time'] = round(time.perf_counter() - start, 6)
+    if trace != None:
+        trace.close()
+
+    record['solved'] = solved_board != None
+    if cache != None and solved_board != None:
+        cache.put(grid, solved_board)
+    record['solution'] = [''.join(row) for row in solved_board] if solved_board != None else None
+    record['iterations'] = solver.current_solve_iterations
+    if check_unique:
+        record['unique'] = len(solver.solutions) == 1
+    if stats:
+        record['stats'] = instrument.summary()
+    return record
+
+# Solves a list of puzzles with batch_propagation, propagating the ones of each size together and
+# searching only the ones the rules don't finish. Returns their records in order (runs in a worker process).
+def solve_batch_files(paths, mode = AUTO, cache_path = None):
+    cache = open_cache(cache_path) if cache_path != None else None
+    records = []
+    sizes = {} # size: [(record, grid)] of the puzzles left to solve
+    for path in paths:
+        record, grid = load_record(path)
+        records.append(record)
+        if grid != None and not (cache != None and cached_record(record, grid, cache)):
+            sizes.setdefault(len(grid), []).append((record, grid))
+
+    for puzzles in sizes.values():
+        start = time.perf_counter()
+        results = batch_propagation.solve_batch([grid for record, grid in puzzles], mode)
+        puzzle_time = (time.perf_counter() - start) / len(puzzles) # the puzzles of a batch share its time
+        for (record, grid), (status, solved_board, nodes) in zip(puzzles, results):
+            record['time'] = round(puzzle_time, 6)
+            record['solved'] = solved_board != None
+            if cache != None and solved_board != None:
+                cache.put(grid, solved_board)
+            record['solution'] = [''.join(row) for row in solved_board] if solved_board != None else None
+            record['iterations'] = nodes
+    return records
+
+# Solves every puzzle on a process pool, yielding records in input or completion order.
+# With vectorized each worker is handed batch_size puzzles at a time for solve_batch_files.
+def solve_all(paths, jobs = None, order = 'input', chunksize = 1, mode = AUTO, check_unique = False, stats = False, trace_directory = None, cache_path = None,
+        vectorized = False, batch_size = DEFAULT_BATCH_SIZE):
+    if vectorized:
+        batches = [paths[start:start + batch_size] for start in range(0, len(paths), batch_size)]
+        task = functools.partial(solve_batch_files, mode = mode, cache_path = cache_path)
+        with multiprocessing.Pool(min(jobs or os.cpu_count(), len(batches))) as pool:
+            results = pool.imap_unordered(task, batches) if order == 'completion' else pool.imap(task, batches)
+            for records in results:
+                for record in records:
+                    yield record
+        return
+
+    task = functools.partial(solve_file, mode = mode, check_unique = check_unique, stats = stats, trace_directory = trace_directory, cache_path = cache_path)
+    with multiprocessing.Pool(jobs) as pool:
+        if order == 'completion':
+            results = pool.imap_unordered(task, paths, chunksize)
+        else:
+            results = pool.imap(task, paths, chunksize)
+        for record in results:
+            yield record
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Solve many binary puzzles and write the results as JSON Lines.')
+    parser.add_argument('inputs', nargs = '*', help = 'puzzle files, directories of .txt puzzles or glob patterns')
+    parser.add_argument('-l', '--list', action = 'append', default = [], help = 'file listing one puzzle path per line')
+    parser.add_argument('-o', '--output', help = 'output file (default: standard output)')
+    parser.add_argument('-j', '--jobs', type = int, default = os.cpu_count(), help = 'number of worker processes (default: all cores)')
+    parser.add_argument('--order', choices = ('input', 'completion'), default = 'input', help = 'order to write results in')
+    parser.add_argument('--mode', choices = MODES, default = AUTO, help = 'search mode of the solver')
+    parser.add_argument('--check-unique', action = 'store_true', help = 'also check that every puzzle has exactly one solution')
+    parser.add_argument('--stats', action = 'store_true', help = 'add nodes, backtracks, depth, propagations by rule and phase times to every line')
+    parser.add_argument('--trace', metavar = 'FOLDER', help = 'write a trace file of every solve event to this folder')
+    parser.add_argument('--cache', nargs = '?', const = CACHE_PATH, metavar = 'FILE', help = 'look solutions up in (and add them to) a solution cache, by default cache/solutions.sqlite')
+    parser.add_argument('--chunksize', type = int, default = 1, help = 'puzzles handed to a worker at a time')
+    parser.add_argument('--vectorized', action = 'store_true', help = 'apply the rules to many puzzles at once with NumPy, searching only the ones they don\'t finish')
+    parser.add_argument('--batch-size', type = int, default = DEFAULT_BATCH_SIZE, help = 'puzzles propagated together with --vectorized (default: %d)' % DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.vectorized:
+        if batch_propagation == None:
+            parser.error('--vectorized needs NumPy (pip install numpy)')
+        if args.check_unique or args.stats or args.trace:
+            parser.error('--vectorized can\'t be used with --check-unique, --stats or --trace')
+    if args.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
+
+    paths = find_puzzles(args.inputs, args.list)
+    if not paths:
+        parser.error('no puzzles found')
+
+    if args.trace:
+        os.makedirs(args.trace, exist_ok = True)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    failed = 0
+    for record in solve_all(paths, args.jobs, args.order, args.chunksize, args.mode, args.check_unique, args.stats, args.trace, args.cache,
+            args.vectorized, args.batch_size):
+        if not record.get('solved') or record.get('unique') == False:
+            failed += 1
+        output.write(json.dumps(record) + '\n')
+        output.flush()
+    if output is not sys.stdout:
+        output.close()
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import numpy
+
+# custom library
+from solver import Solver, AUTO, SOLVED, UNSOLVABLE
+
+OPEN = 'open' # the rules alone didn't finish the puzzle, it needs a search
+
+EMPTY_CODE = -1 # empty cells in the batch array, filled cells hold 0 or 1
+
+
+# Converts same-size grids into a (B, n, n) int8 array with -1 for empty cells
+def to_array(grids):
+    size = len(grids[0])
+    text = ''.join([''.join(row) for grid in grids for row in grid]).encode()
+    codes = numpy.frombuffer(text, dtype = numpy.uint8).reshape(len(grids), size, size)
+    return numpy.where(codes == ord('_'), EMPTY_CODE, codes - ord('0')).astype(numpy.int8)
+
+def to_grid(board):
+    return [['_' if value < 0 else str(value) for value in row] for row in board.tolist()]
+
+# Returns the rows of a batch as bit masks, (B, n) int64 arrays of the ones and the zeros with cell x as bit x
+def row_masks(boards):
+    weights = numpy.left_shift(numpy.int64(1), numpy.arange(boards.shape[2], dtype = numpy.int64))
+    return (boards == 1) @ weights, (boards == 0) @ weights
+
+# Turns (B, n) row masks back into a (B, n, n) bool array
+def mask_cells(masks, size):
+    return (masks[:, :, None] >> numpy.arange(size, dtype = numpy.int64) & 1).astype(bool)
+
+# Returns where masks have three set bits in a row
+def runs_of_three(masks):
+    return (masks & (masks >> 1) & (masks >> 2)) != 0
+
+# Returns (to_zero, to_one, broken) for the rows of a batch: the empty cells the pair, sandwich, count
+# completion and completions rules force, and which puzzles have a row that can't be completed.
+# Works like the bitboard line rules, on every row of every puzzle at once.
+def forced_in_rows(boards):
+    size = boards.shape[2]
+    half = size // 2
+    full = (1 << size) - 1
+    ones, zeros = row_masks(boards)
+    empty = full & ~(ones | zeros)
+    to_zero = numpy.zeros(ones.shape, dtype = numpy.int64)
+    to_one = numpy.zeros(ones.shape, dtype = numpy.int64)
+
+    for same, opposite in ((zeros, to_one), (ones, to_zero)):
+        # pairs force the cells on both sides, sandwiches force the cell in the middle
+        pairs = same & (same >> 1)
+        opposite |= (pairs >> 1) | (pairs << 2) | ((same & (same >> 2)) << 1)
+
+    # count completion, a digit used up fills the rest of the line with the other one
+    one_count = (boards == 1).sum(axis = 2)
+    zero_count = (boards == 0).sum(axis = 2)
+    to_one[zero_count == half] = full
+    to_zero[one_count == half] = full
+
+    broken = (runs_of_three(ones) | runs_of_three(zeros) | (one_count > half) | (zero_count > half)).any(axis = 1)
+
+    # one of a digit left, every place it could go is tried at once (only in the lines where that is the case)
+    full_lines = numpy.where(empty == 0, ones, -1) # ones of each full line, -1 if not full
+    places = numpy.left_shift(numpy.int64(1), numpy.arange(size, dtype = numpy.int64)) # place p puts the last digit in cell p
+    for digit_left, other_left, digit, other, to_digit, to_other in (
+            (half - one_count, half - zero_count, ones, zeros, to_one, to_zero),
+            (half - zero_count, half - one_count, zeros, ones, to_zero, to_one)):
+        puzzles, lines = numpy.nonzero((digit_left == 1) & (other_left > 0))
+        if not len(puzzles):
+            continue
+        line_empty = empty[puzzles, lines][:, None]
+        completed_digit = digit[puzzles, lines][:, None] | places # (lines, places)
+        completed_other = (other[puzzles, lines][:, None] | line_empty) & ~places
+        fits = (line_empty & places != 0) & ~runs_of_three(completed_digit) & ~runs_of_three(completed_other)
+
+        # a completion can't copy a full line
+        completed_ones = completed_digit if digit is ones else completed_other
+        fits &= ~(completed_ones[:, :, None] == full_lines[puzzles][:, None, :]).any(axis = 2)
+
+        fitting = (places * fits).sum(axis = 1)
+        place_count = fits.sum(axis = 1)
+        to_other[puzzles, lines] |= line_empty[:, 0] & ~fitting # no completion has the digit here
+        to_digit[puzzles, lines] |= numpy.where(place_count == 1, fitting, 0) # the only place left
+        broken[puzzles[place_count == 0]] = True
+
+    return mask_cells(to_zero & empty, size), mask_cells(to_one & empty, size), broken
+
+# Returns which puzzles of a batch have two equal full rows
+def duplicate_rows(boards):
+    full = (boards >= 0).all(axis = 2)
+    codes = numpy.where(full, row_masks(boards)[0], -1 - numpy.arange(boards.shape[2])) # rows that aren't full never match
+    codes.sort(axis = 1)
+    return (codes[:, 1:] == codes[:, :-1]).any(axis = 1)
+
+# Applies the rules to every puzzle of a batch at once until nothing changes.
+# Returns (boards, statuses) with each status SOLVED, UNSOLVABLE or OPEN.
+def propagate_batch(grids):
+    boards = to_array(grids)
+    broken = numpy.zeros(len(grids), dtype = bool)
+    active = numpy.arange(len(grids)) # puzzles that changed in the last pass
+
+    while len(active):
+        part = boards[active]
+        columns = part.transpose(0, 2, 1) # a view, so writing to it writes to part
+        row_zero, row_one, row_broken = forced_in_rows(part)
+        column_zero, column_one, column_broken = forced_in_rows(columns)
+        to_zero = row_zero | column_zero.transpose(0, 2, 1)
+        to_one = row_one | column_one.transpose(0, 2, 1)
+
+        # a cell forced both ways means the puzzle has no solution
+        part_broken = row_broken | column_broken | (to_zero & to_one).any(axis = (1, 2))
+        part[to_zero] = 0
+        part[to_one] = 1
+        boards[active] = part
+
+        broken[active[part_broken]] = True
+        changed = (to_zero | to_one).any(axis = (1, 2))
+        active = active[changed & ~part_broken]
+
+    # full boards still have to be checked, the rules above don't look at repeated lines
+    full = (boards >= 0).all(axis = (1, 2))
+    broken |= forced_in_rows(boards)[2] | forced_in_rows(boards.transpose(0, 2, 1))[2]
+    broken |= full & (duplicate_rows(boards) | duplicate_rows(boards.transpose(0, 2, 1)))
+
+    statuses = []
+    for index in range(len(grids)):
+        if broken[index]:
+            statuses.append(UNSOLVABLE)
+        elif full[index]:
+            statuses.append(SOLVED)
+        else:
+            statuses.append(OPEN)
+    return boards, statuses
+
+# Solves same-size grids, propagating them together and searching only the ones the rules don't finish.
+# Returns a list of (status, solved board or None, search nodes).
+def solve_batch(grids, mode = AUTO):
+    if not grids:
+        return []
+    boards, statuses = propagate_batch(grids)
+    results = []
+    for board, status in zip(boards, statuses):
+        if status == SOLVED:
+            results.append((SOLVED, to_grid(board), 0))
+        elif status == UNSOLVABLE:
+            results.append((UNSOLVABLE, None, 0))
+        else:
+            # the cells filled in so far are forced, so the search can start from them
+            solver = Solver(to_grid(board), mode = mode)
+            solved_board = solver.run()
+            results.append((solver.status, solved_board, solver.current_solve_iterations))
+    return results
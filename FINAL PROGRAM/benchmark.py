@@ -0,0 +1,144 @@
+import sys
+import os
+import time
+import json
+import argparse
+import platform
+
+# custom library
+from solver import Solver, MODES, AUTO, BACKTRACK, CONSTRAINED, AUTO_SAT_SIZE, SOLVED
+from batch import find_puzzles, load_entry, entry_name
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+PUZZLE_FOLDERS = (os.path.join(FOLDER, 'puzzles'), os.path.join(FOLDER, 'benchmarks')) # benchmarks holds generated larger puzzles
+BASELINE_PATH = os.path.join(FOLDER, 'benchmarks', 'baseline.json')
+
+DEFAULT_THRESHOLD = 0.25 # fraction slower than the baseline that counts as a regression
+DEFAULT_MIN_DELTA = 0.0005 # seconds, smaller differences are timer noise
+DEFAULT_REPEAT = 5
+REPEAT_SECONDS = 2 # a puzzle isn't solved again once this much time has been spent on it
+DEFAULT_TIME_LIMIT = 10 # seconds per solve
+CELL_SEARCHES = (BACKTRACK, CONSTRAINED) # left out of the default set: puzzles over AUTO_SAT_SIZE, which can take them minutes
+
+
+# Solves a puzzle up to repeat times and returns its measurements (the fastest time is kept)
+def benchmark_puzzle(path, mode = AUTO, repeat = DEFAULT_REPEAT, time_limit = DEFAULT_TIME_LIMIT):
+    grid = load_entry(path)
+    best_time = None
+    total_time = 0
+    for i in range(repeat):
+        start = time.perf_counter()
+        solver = Solver(grid, mode = mode, time_limit = time_limit)
+        solver.run()
+        elapsed = time.perf_counter() - start
+        if best_time == None or elapsed < best_time:
+            best_time = elapsed
+        total_time += elapsed
+        if total_time >= REPEAT_SECONDS or not solver.solved:
+            break
+
+    return {
+        'time': round(best_time, 6),
+        'nodes': solver.current_solve_iterations,
+        'backtracks': solver.backtracks,
+        'propagations': solver.propagator.propagations,
+        'status': solver.status,
+        }
+
+# Names puzzles by file name so baselines work from any folder
+def puzzle_name(path):
+    return os.path.basename(entry_name(path))
+
+def load_baselines(path):
+    if not os.path.exists(path):
+        return {}
+    file = open(path, 'r')
+    baselines = json.load(file)
+    file.close()
+    return baselines
+
+def save_baselines(path, baselines):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok = True)
+    file = open(path, 'w')
+    json.dump(baselines, file, indent = 2, sort_keys = True)
+    file.write('\n')
+    file.close()
+
+# Returns a list of problems with a result compared to its baseline (empty if it passes)
+def compare(result, baseline, threshold = DEFAULT_THRESHOLD, min_delta = DEFAULT_MIN_DELTA):
+    problems = []
+    if result['status'] != SOLVED:
+        # a puzzle the baseline couldn't solve either is reported but doesn't fail
+        if baseline == None or baseline['status'] == SOLVED:
+            problems.append(result['status'])
+    elif baseline != None and baseline['status'] == SOLVED:
+        slower = result['time'] - baseline['time']
+        if result['time'] > baseline['time'] * (1 + threshold) and slower > min_delta:
+            problems.append('%.1f%% slower' % (100 * slower / baseline['time']))
+    return problems
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark the solver and fail when a puzzle gets slower than its baseline.')
+    parser.add_argument('inputs', nargs = '*', help = 'puzzle files, folders or glob patterns (default: puzzles and benchmarks)')
+    parser.add_argument('--mode', choices = MODES, default = AUTO, help = 'search mode of the solver')
+    parser.add_argument('--repeat', type = int, default = DEFAULT_REPEAT, help = 'solves per puzzle, the fastest is kept')
+    parser.add_argument('--time-limit', type = float, default = DEFAULT_TIME_LIMIT, help = 'seconds before a solve is stopped')
+    parser.add_argument('--threshold', type = float, default = DEFAULT_THRESHOLD, help = 'fraction slower than the baseline that fails (default: 0.25)')
+    parser.add_argument('--min-delta', type = float, default = DEFAULT_MIN_DELTA, help = 'seconds slower a puzzle must also be to fail')
+    parser.add_argument('--baseline', default = BASELINE_PATH, help = 'baseline file')
+    parser.add_argument('--update', action = 'store_true', help = 'save this run as the baseline')
+    args = parser.parse_args(argv)
+
+    paths = find_puzzles(args.inputs or PUZZLE_FOLDERS)
+    if not args.inputs and args.mode in CELL_SEARCHES:
+        small_paths = [path for path in paths if len(load_entry(path)) <= AUTO_SAT_SIZE]
+        if len(small_paths) < len(paths):
+            print('Leaving out %d puzzle(s) over %dx%d, name them to benchmark them in %s mode' % (
+                len(paths) - len(small_paths), AUTO_SAT_SIZE, AUTO_SAT_SIZE, args.mode))
+        paths = small_paths
+    if not paths:
+        parser.error('no puzzles found')
+
+    baselines = load_baselines(args.baseline)
+    mode_baselines = baselines.get(args.mode, {}).get('puzzles', {})
+
+    results = {}
+    failures = 0
+    print('%-16s %10s %10s %8s %10s %13s %10s  %s' % ('puzzle', 'time (ms)', 'base (ms)', 'nodes', 'backtracks', 'propagations', 'ratio', 'result'))
+    for path in paths:
+        name = puzzle_name(path)
+        result = benchmark_puzzle(path, args.mode, args.repeat, args.time_limit)
+        results[name] = result
+
+        baseline = mode_baselines.get(name)
+        problems = compare(result, baseline, args.threshold, args.min_delta)
+        if problems:
+            failures += 1
+
+        if baseline != None:
+            base_time = '%.2f' % (baseline['time'] * 1000)
+            ratio = '%.2f' % (result['time'] / baseline['time']) if baseline['time'] else '-'
+        else:
+            base_time = ratio = '-'
+        print('%-16s %10.2f %10s %8d %10d %13d %10s  %s' % (
+            name, result['time'] * 1000, base_time, result['nodes'], result['backtracks'], result['propagations'], ratio,
+            ', '.join(problems) if problems else result['status']))
+
+    if args.update:
+        baselines[args.mode] = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'puzzles': results,
+            }
+        save_baselines(args.baseline, baselines)
+        print('Saved baseline to', args.baseline)
+    elif not mode_baselines:
+        print('No baseline for %s mode yet, run with --update to save one' % args.mode)
+
+    if failures:
+        print(failures, 'puzzle(s) failed')
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+class BitBoard():
+    '''A binary puzzle board stored as integer bitmasks for each row and column'''
+
+    empty = '_'
+
+    def __init__(self, grid):
+        self.size = len(grid)
+        self.half = self.size // 2
+        self.full = (1 << self.size) - 1 # mask with every cell in a line filled
+
+        # bit x of a row mask is column x, bit y of a column mask is row y
+        self.row_ones = [0] * self.size
+        self.row_filled = [0] * self.size
+        self.column_ones = [0] * self.size
+        self.column_filled = [0] * self.size
+
+        # amount of zeros and ones in each line ([zeros, ones])
+        self.row_counts = [[0, 0] for i in range(self.size)]
+        self.column_counts = [[0, 0] for i in range(self.size)]
+
+        # how many full rows/columns have each ones mask (signature)
+        self.complete_rows = {}
+        self.complete_columns = {}
+
+        self.cursor = 0 # no empty cells before this row-major position
+
+        for row in range(self.size):
+            for column in range(self.size):
+                if grid[row][column] != self.empty:
+                    self.set(row, column, int(grid[row][column]))
+
+    # Places a 0 or 1 in an empty cell
+    def set(self, row, column, number):
+        row_filled = self.row_filled[row] | 1 << column
+        column_filled = self.column_filled[column] | 1 << row
+        self.row_filled[row] = row_filled
+        self.column_filled[column] = column_filled
+        if number:
+            self.row_ones[row] |= 1 << column
+            self.column_ones[column] |= 1 << row
+        self.row_counts[row][number] += 1
+        self.column_counts[column][number] += 1
+
+        if row_filled == self.full:
+            ones = self.row_ones[row]
+            self.complete_rows[ones] = self.complete_rows.get(ones, 0) + 1
+        if column_filled == self.full:
+            ones = self.column_ones[column]
+            self.complete_columns[ones] = self.complete_columns.get(ones, 0) + 1
+
+    # Empties a filled cell
+    def clear(self, row, column):
+        row_ones = self.row_ones[row]
+        column_ones = self.column_ones[column]
+        number = row_ones >> column & 1
+
+        if self.row_filled[row] == self.full:
+            self.remove_signature(self.complete_rows, row_ones)
+        if self.column_filled[column] == self.full:
+            self.remove_signature(self.complete_columns, column_ones)
+
+        row_bit = ~(1 << column)
+        column_bit = ~(1 << row)
+        self.row_filled[row] &= row_bit
+        self.row_ones[row] = row_ones & row_bit
+        self.column_filled[column] &= column_bit
+        self.column_ones[column] = column_ones & column_bit
+        self.row_counts[row][number] -= 1
+        self.column_counts[column][number] -= 1
+
+        position = row * self.size + column
+        if position < self.cursor:
+            self.cursor = position
+
+    # Forgets one full line with the given ones mask
+    def remove_signature(self, signatures, ones):
+        if signatures[ones] == 1:
+            del signatures[ones]
+        else:
+            signatures[ones] -= 1
+
+    # Returns the value of a cell as it is stored in a puzzle file
+    def get(self, row, column):
+        if not self.row_filled[row] >> column & 1:
+            return self.empty
+        return str(self.row_ones[row] >> column & 1)
+
+    # Checks a single line for triples and more than half of either digit
+    def line_valid(self, ones, filled):
+        zeros = filled & ~ones
+        if ones & (ones >> 1) & (ones >> 2) or zeros & (zeros >> 1) & (zeros >> 2):
+            return False
+        return ones.bit_count() <= self.half and zeros.bit_count() <= self.half
+
+    # Checks for triples in the five cells centred on a position of a line
+    def run_valid(self, ones, filled, position):
+        if position > 2:
+            ones >>= position - 2
+            filled >>= position - 2
+        ones &= 31
+        zeros = filled & 31 & ~ones
+        return not (ones & (ones >> 1) & (ones >> 2) or zeros & (zeros >> 1) & (zeros >> 2))
+
+    # Checks that the row and column through the last filled cell still follow the rules
+    def possible(self, row, column):
+        row_ones = self.row_ones[row]
+        row_filled = self.row_filled[row]
+        column_ones = self.column_ones[column]
+        column_filled = self.column_filled[column]
+        number = row_ones >> column & 1
+
+        # more than half of one digit
+        if self.row_counts[row][number] > self.half or self.column_counts[column][number] > self.half:
+            return False
+
+        # three in a row
+        if not (self.run_valid(row_ones, row_filled, column) and self.run_valid(column_ones, column_filled, row)):
+            return False
+
+        # unique rows and columns
+        if row_filled == self.full and self.complete_rows[row_ones] > 1:
+            return False
+        if column_filled == self.full and self.complete_columns[column_ones] > 1:
+            return False
+
+        return True
+
+    # Returns the first empty cell in row-major order, or None when the board is full
+    def next_empty(self):
+        cells = self.size * self.size
+        while self.cursor < cells:
+            row, column = divmod(self.cursor, self.size)
+            if not self.row_filled[row] >> column & 1:
+                return row, column
+            self.cursor += 1
+        return None
+
+    # Returns the first empty cell of the fullest unfinished row or column, or None when the board is full
+    def most_constrained(self):
+        best = -1
+        cell = None
+        for row in range(self.size):
+            filled = self.row_filled[row]
+            if filled != self.full and filled.bit_count() > best:
+                best = filled.bit_count()
+                cell = (row, (~filled & (filled + 1)).bit_length() - 1)
+        for column in range(self.size):
+            filled = self.column_filled[column]
+            if filled != self.full and filled.bit_count() > best:
+                best = filled.bit_count()
+                cell = ((~filled & (filled + 1)).bit_length() - 1, column)
+        return cell
+
+    # Converts the masks back into a list of lists of strings
+    def to_grid(self):
+        return [[self.get(row, column) for column in range(self.size)] for row in range(self.size)]
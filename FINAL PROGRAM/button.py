@@ -1,11 +1,9 @@
 import pygame
 
-pygame.init()
-
 class Button():
     '''A basic UI button'''
 
-    def __init__(self, text, position, dimensions, idle, hovered, clicked, font = pygame.font.SysFont("Arial", 24), font_colour = (0,0,0)):
+    def __init__(self, text, position, dimensions, idle, hovered, clicked, font = None, font_colour = (0,0,0)):
         self.current_state = 'idle'
         self.text = text
         self.position = position
@@ -19,6 +17,8 @@ class Button():
         self.button_rect = pygame.Rect(position, dimensions)
         
         self.font_colour = font_colour
+        if font == None:
+            font = pygame.font.SysFont("Arial", 24)
         self.text_surface = font.render(text, True, self.font_colour)
         self.text_rect = self.text_surface.get_rect(center = self.button_rect.center)
     
@@ -0,0 +1,163 @@
+import sys
+import os
+import mmap
+import struct
+import argparse
+
+# custom library
+from solver import load_puzzle, save_puzzle
+
+# File layout, every number little endian:
+#   header  magic b'BPZC', version (2 bytes), unused (2 bytes), puzzle count (8 bytes), index offset (8 bytes)
+#   records one per puzzle: name length (2 bytes), name (UTF-8), size (2 bytes), cells packed 4 to a byte
+#   index   offset of each record from the start of the file (8 bytes each)
+# A cell takes 2 bits, cell x of a byte is bits 2x and 2x+1, in row-major order.
+MAGIC = b'BPZC'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQ')
+OFFSET = struct.Struct('<Q')
+LENGTH = struct.Struct('<H')
+EXTENSION = '.bpz'
+
+CELL_CODES = str.maketrans('_01', '012') # cell values to base 4 digits
+CELL_VALUES = '_01?' # the last code is never written
+BYTE_CELLS = [''.join([CELL_VALUES[byte >> shift & 3] for shift in (0, 2, 4, 6)]) for byte in range(256)] # the 4 cells of every byte
+
+open_collections = {} # collections already opened in this process, by path
+
+
+# Packs a grid into bytes, 2 bits per cell
+def pack_grid(grid):
+    cells = ''.join([''.join(row) for row in grid]).translate(CELL_CODES)
+    # read as a base 4 number with the first cell as the lowest digit
+    return int(cells[::-1], 4).to_bytes((len(cells) + 3) // 4, 'little')
+
+def unpack_grid(data, size):
+    cells = ''.join([BYTE_CELLS[byte] for byte in data])
+    return [list(cells[start:start + size]) for start in range(0, size * size, size)]
+
+# Writes puzzles given as (name, grid) to a collection file
+def write_collection(path, puzzles):
+    file = open(path, 'wb')
+    file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0)) # filled in once the count and index offset are known
+    offsets = []
+    for name, grid in puzzles:
+        offsets.append(file.tell())
+        name = name.encode('utf-8')
+        file.write(LENGTH.pack(len(name)) + name + LENGTH.pack(len(grid)) + pack_grid(grid))
+
+    index_offset = file.tell()
+    for offset in offsets:
+        file.write(OFFSET.pack(offset))
+    file.seek(0)
+    file.write(HEADER.pack(MAGIC, VERSION, 0, len(offsets), index_offset))
+    file.close()
+
+# Returns the collection at a path, opened once per process
+def open_collection(path):
+    if path not in open_collections:
+        open_collections[path] = PuzzleCollection(path)
+    return open_collections[path]
+
+def is_collection(path):
+    return path.endswith(EXTENSION)
+
+
+class PuzzleCollection():
+    '''A packed collection file read through mmap, any puzzle can be read without parsing the ones before it'''
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        if len(self.data) < HEADER.size:
+            raise ValueError('Invalid Puzzle Collection: %s is too short' % path)
+        magic, version, unused, self.count, self.index_offset = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Invalid Puzzle Collection: %s is not a version %d collection' % (path, VERSION))
+        if self.index_offset + self.count * OFFSET.size > len(self.data):
+            raise ValueError('Invalid Puzzle Collection: %s is truncated' % path)
+
+    def __len__(self):
+        return self.count
+
+    # Returns puzzle number index as a list of lists of strings
+    def __getitem__(self, index):
+        return self.read(self.offset(index))[1]
+
+    def name(self, index):
+        return self.read(self.offset(index))[0]
+
+    def offset(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('puzzle index out of range')
+        return OFFSET.unpack_from(self.data, self.index_offset + index * OFFSET.size)[0]
+
+    # Reads the record at an offset, returns (name, grid, offset of the next record)
+    def read(self, offset):
+        data = self.data
+        name_length = LENGTH.unpack_from(data, offset)[0]
+        offset += LENGTH.size
+        name = data[offset:offset + name_length].decode('utf-8')
+        offset += name_length
+        size = LENGTH.unpack_from(data, offset)[0]
+        offset += LENGTH.size
+        end = offset + (size * size + 3) // 4
+        return name, unpack_grid(data[offset:end], size), end
+
+    # Yields every puzzle as (name, grid) in order, reading the records one after another
+    def __iter__(self):
+        offset = HEADER.size
+        for index in range(self.count):
+            name, grid, offset = self.read(offset)
+            yield name, grid
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+        if open_collections.get(self.path) is self:
+            del open_collections[self.path]
+
+
+# Yields (name, grid) for puzzles found by batch.find_puzzles, so collections can be packed together too
+def named_puzzles(entries):
+    for entry in entries:
+        if isinstance(entry, tuple):
+            collection = open_collection(entry[0])
+            name, grid, end = collection.read(collection.offset(entry[1]))
+            yield name, grid
+        else:
+            yield os.path.basename(entry), load_puzzle(entry)
+
+def main(argv = None):
+    # the folder search of batch.py is reused for the puzzles to pack
+    from batch import find_puzzles
+
+    parser = argparse.ArgumentParser(description = 'Convert puzzle files to and from packed puzzle collections.')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+    pack = commands.add_parser('pack', help = 'pack puzzle files into a collection')
+    pack.add_argument('inputs', nargs = '+', help = 'puzzle files, folders of .txt puzzles, glob patterns or other collections')
+    pack.add_argument('-o', '--output', required = True, help = 'collection file to write (' + EXTENSION + ')')
+    unpack = commands.add_parser('unpack', help = 'write every puzzle of a collection to its own file')
+    unpack.add_argument('collection', help = 'collection file')
+    unpack.add_argument('-o', '--output', default = 'puzzles', help = 'folder to write the puzzles to (default: puzzles)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'pack':
+        entries = find_puzzles(args.inputs)
+        write_collection(args.output, named_puzzles(entries))
+        print('Packed', len(entries), 'puzzles into', args.output)
+    else:
+        collection = PuzzleCollection(args.collection)
+        os.makedirs(args.output, exist_ok = True)
+        for index, (name, grid) in enumerate(collection):
+            save_puzzle(os.path.join(args.output, os.path.basename(name) or '%08d.txt' % index), grid)
+        print('Unpacked', len(collection), 'puzzles into', args.output)
+        collection.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+import sys
+import os
+import copy
+import random
+import argparse
+import multiprocessing
+
+# custom library
+from bitboard import BitBoard
+from propagation import Propagator
+from solver import Solver, save_puzzle, toggle, EMPTY, UNSOLVABLE, CONSTRAINED
+
+# difficulties, the same letters as the puzzle file names
+EASY = 'E' # solvable by logic alone, keeps at least EASY_GIVENS of the cells
+MEDIUM = 'M' # solvable by logic alone, no given can be removed without needing a guess
+HARD = 'H' # no given can be removed without losing uniqueness
+VERY_HARD = 'V' # like HARD but logic alone can't solve it
+DIFFICULTIES = (EASY, MEDIUM, HARD, VERY_HARD)
+
+EASY_GIVENS = 0.5
+UNIQUE_NODE_LIMIT = 200 # search nodes a uniqueness check may use before the given is kept to be safe
+MAX_ATTEMPTS = 20 # grids tried for a puzzle logic does (EASY, MEDIUM) or doesn't (VERY_HARD) solve
+
+
+# Returns a random full grid that follows every rule
+def random_solution(size, rng):
+    empty_grid = [[EMPTY] * size for i in range(size)]
+    while True:
+        # restarts with a new random order instead of getting stuck in one bad part of the search
+        solver = Solver(empty_grid, mode = CONSTRAINED, node_limit = 4 * size * size, rng = rng)
+        board = solver.run()
+        if board != None:
+            return board
+
+# Returns True if propagation alone fills in the whole grid (which also means it has one solution)
+def solved_by_logic(grid):
+    bitboard = BitBoard(grid)
+    propagator = Propagator(bitboard)
+    propagator.push_all()
+    return propagator.propagate() and bitboard.next_empty() == None
+
+# Returns True if the row or column of an empty cell alone forces it to hold number
+def forced_by_line(propagator, row, column, number):
+    bitboard = propagator.bitboard
+    forced = propagator.line_forced(bitboard.row_ones[row], bitboard.row_filled[row], bitboard.complete_rows)
+    if forced != None and forced[number] >> column & 1:
+        return True
+    forced = propagator.line_forced(bitboard.column_ones[column], bitboard.column_filled[column], bitboard.complete_columns)
+    return forced != None and forced[number] >> row & 1 == 1
+
+# Checks that a grid which had one solution still has one after emptying a cell that held value.
+# Any new solution must have the other digit in that cell, so only that one branch is searched.
+# A check that runs out of nodes counts as not unique.
+def still_unique(grid, row, column, value):
+    grid[row][column] = toggle(value)
+    solver = Solver(grid, mode = CONSTRAINED, node_limit = UNIQUE_NODE_LIMIT)
+    solver.run()
+    grid[row][column] = EMPTY
+    return solver.status == UNSOLVABLE
+
+# Empties givens in a random order, keeping each removal only if the puzzle is still solvable by logic alone
+# (or, for HARD and VERY_HARD, still has one solution)
+def remove_givens(solution, difficulty, rng):
+    size = len(solution)
+    grid = copy.deepcopy(solution)
+
+    cells = [(row, column) for row in range(size) for column in range(size)]
+    rng.shuffle(cells)
+
+    # the givens as a bitboard, so a cell its own row or column forces can be removed without propagating the whole grid
+    propagator = Propagator(BitBoard(grid))
+
+    minimum = round(size * size * EASY_GIVENS) if difficulty == EASY else 0
+    givens = size * size
+    for row, column in cells:
+        if givens <= minimum:
+            break
+        value = grid[row][column]
+        grid[row][column] = EMPTY
+        propagator.bitboard.clear(row, column)
+        if forced_by_line(propagator, row, column, int(value)) or solved_by_logic(grid):
+            givens -= 1
+        else:
+            grid[row][column] = value
+            propagator.bitboard.set(row, column, int(value))
+
+    # the cheap logic check has removed most givens, only the ones left need the uniqueness check
+    if difficulty in (HARD, VERY_HARD):
+        for row, column in cells:
+            value = grid[row][column]
+            if value != EMPTY:
+                grid[row][column] = EMPTY
+                if not still_unique(grid, row, column, value):
+                    grid[row][column] = value
+
+    return grid
+
+# Generates one puzzle with exactly one solution, the same seed always gives the same puzzle.
+# Returns (grid, difficulty), the difficulty is HARD when no VERY_HARD puzzle turned up in MAX_ATTEMPTS grids.
+# EASY and MEDIUM puzzles are checked once more with the whole propagation, a grid it can't solve is thrown away.
+def generate(size, difficulty = HARD, seed = None):
+    if size % 2 != 0 or size < 2:
+        raise ValueError('Puzzles need an even size')
+    if difficulty not in DIFFICULTIES:
+        raise ValueError('Unknown difficulty: ' + str(difficulty))
+
+    rng = random.Random(seed)
+    for attempt in range(MAX_ATTEMPTS):
+        grid = remove_givens(random_solution(size, rng), difficulty, rng)
+        if difficulty == HARD:
+            return grid, HARD
+        if difficulty == VERY_HARD:
+            if not solved_by_logic(grid):
+                return grid, VERY_HARD
+        elif solved_by_logic(grid):
+            return grid, difficulty
+    if difficulty == VERY_HARD:
+        return grid, HARD # the givens left still can't be removed without losing uniqueness
+    raise RuntimeError('No puzzle solvable by logic alone found in %d grids' % MAX_ATTEMPTS)
+
+def generate_task(task):
+    size, difficulty, seed = task
+    grid, reached = generate(size, difficulty, seed)
+    return seed, grid, reached
+
+# Generates puzzles on a process pool, yielding (seed, grid, difficulty reached) as they finish
+def generate_all(size, difficulty, seeds, jobs = None):
+    tasks = [(size, difficulty, seed) for seed in seeds]
+    with multiprocessing.Pool(jobs) as pool:
+        for result in pool.imap_unordered(generate_task, tasks):
+            yield result
+
+# Returns the first free number for files named like 14H-0001.txt
+def next_index(directory, prefix):
+    index = 1
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.startswith(prefix + '-') and name.endswith('.txt'):
+                number = name[len(prefix) + 1:-4]
+                if number.isdigit():
+                    index = max(index, int(number) + 1)
+    return index
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Generate binary puzzles with exactly one solution.')
+    parser.add_argument('size', type = int, help = 'width and height of the puzzles (even)')
+    parser.add_argument('-d', '--difficulty', choices = DIFFICULTIES, default = HARD, help = 'E, M, H or V (default: H)')
+    parser.add_argument('-n', '--count', type = int, default = 1, help = 'number of puzzles to generate')
+    parser.add_argument('-o', '--output', default = 'puzzles', help = 'folder to write the puzzles to (default: puzzles)')
+    parser.add_argument('-j', '--jobs', type = int, default = os.cpu_count(), help = 'number of worker processes (default: all cores)')
+    parser.add_argument('--seed', type = int, help = 'seed of the first puzzle, the rest use the following numbers')
+    args = parser.parse_args(argv)
+
+    if args.size % 2 != 0 or args.size < 2:
+        parser.error('size must be even')
+
+    os.makedirs(args.output, exist_ok = True)
+    prefix = '%02d%s' % (args.size, args.difficulty)
+    first_index = next_index(args.output, prefix)
+    first_seed = args.seed if args.seed != None else random.randrange(2 ** 32)
+
+    seeds = [first_seed + number for number in range(args.count)]
+    for seed, grid, reached in generate_all(args.size, args.difficulty, seeds, args.jobs):
+        if reached == args.difficulty:
+            path = os.path.join(args.output, '%s-%04d.txt' % (prefix, first_index + seed - first_seed))
+        else:
+            # named by the difficulty it has, numbered after the puzzles of that difficulty already there
+            reached_prefix = '%02d%s' % (args.size, reached)
+            path = os.path.join(args.output, '%s-%04d.txt' % (reached_prefix, next_index(args.output, reached_prefix)))
+            print('No very hard puzzle found for seed %d, saving a hard one' % seed, file = sys.stderr)
+        save_puzzle(path, grid)
+        print(path)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
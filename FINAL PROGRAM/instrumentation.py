@@ -0,0 +1,95 @@
+import time
+
+# events passed to callbacks
+NODE = 'node' # depth, row, column, value guessed
+BACKTRACK = 'backtrack' # depth of the guess that broke a rule
+PROPAGATE = 'propagate' # rule, cells it filled in
+PHASE = 'phase' # phase name, seconds spent in it
+SOLUTION = 'solution' # number of solutions found so far
+
+# propagation rules
+PAIRS = 'pairs' # pairs and sandwiches
+COUNT = 'count' # half of one digit already placed
+COMPLETIONS = 'completions' # one of a digit left, tried in every place
+
+# solve phases
+MANUAL = 'manual' # propagation before any guess
+SEARCH = 'search'
+
+
+class Instrument():
+    '''Counts what a solve does and passes every event on to an optional callback'''
+
+    def __init__(self, callback = None):
+        self.callback = callback # called as callback(event, *fields)
+
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.solutions = 0
+        self.propagations = {} # cells filled in, by rule
+        self.phase_times = {} # seconds, by phase
+
+    def node(self, depth, row, column, number):
+        self.nodes += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.callback != None:
+            self.callback(NODE, depth, row, column, number)
+
+    def backtrack(self, depth):
+        self.backtracks += 1
+        if self.callback != None:
+            self.callback(BACKTRACK, depth)
+
+    def propagated(self, rule, cells):
+        self.propagations[rule] = self.propagations.get(rule, 0) + cells
+        if self.callback != None:
+            self.callback(PROPAGATE, rule, cells)
+
+    def phase(self, name, seconds):
+        self.phase_times[name] = self.phase_times.get(name, 0) + seconds
+        if self.callback != None:
+            self.callback(PHASE, name, seconds)
+
+    def solution(self):
+        self.solutions += 1
+        if self.callback != None:
+            self.callback(SOLUTION, self.solutions)
+
+    # Returns the counters as a dictionary (ready for JSON)
+    def summary(self):
+        return {
+            'nodes': self.nodes,
+            'backtracks': self.backtracks,
+            'max_depth': self.max_depth,
+            'solutions': self.solutions,
+            'propagations': dict(self.propagations),
+            'phase_times': {name: round(seconds, 6) for name, seconds in self.phase_times.items()},
+            }
+
+
+class TraceWriter():
+    '''A callback for Instrument that writes every event to a compact tab separated trace file'''
+
+    def __init__(self, path):
+        self.file = open(path, 'w')
+        self.start = time.perf_counter()
+
+    # One line per event: microseconds since the trace started, event name, fields
+    def __call__(self, event, *fields):
+        microseconds = int((time.perf_counter() - self.start) * 1000000)
+        self.file.write('%d\t%s\t%s\n' % (microseconds, event, '\t'.join([str(field) for field in fields])))
+
+    def close(self):
+        self.file.close()
+
+# Reads a trace file back as a list of (microseconds, event, fields)
+def read_trace(path):
+    events = []
+    file = open(path, 'r')
+    for line in file:
+        parts = line.rstrip('\n').split('\t')
+        events.append((int(parts[0]), parts[1], parts[2:]))
+    file.close()
+    return events
@@ -0,0 +1,212 @@
+import os
+import array
+
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache')
+
+MATCH_CHUNK = 50000 # patterns filtered between calls to should_stop, a few milliseconds of work
+
+loaded_lines = {} # legal lines already loaded in this process, by size
+
+
+# Returns every legal line of a size (balanced, no three in a row) as integer patterns, bit x is cell x
+def legal_lines(size, cache_directory = CACHE_DIRECTORY):
+    if size not in loaded_lines:
+        patterns = read_cache(size, cache_directory)
+        if patterns == None:
+            patterns = enumerate_lines(size)
+            write_cache(size, patterns, cache_directory)
+        loaded_lines[size] = tuple(patterns)
+    return loaded_lines[size]
+
+# Builds every legal line one cell at a time
+def enumerate_lines(size):
+    half = size // 2
+    patterns = []
+    stack = [(0, 0, 0)] # (pattern, cells placed, ones placed)
+    while stack:
+        pattern, length, ones = stack.pop()
+        if length == size:
+            patterns.append(pattern)
+            continue
+
+        for number in range(2):
+            new_ones = ones + number
+            if new_ones > half or length + 1 - new_ones > half:
+                continue
+            # the two cells before this one must not both match it
+            if length >= 2 and (pattern >> (length - 1) & 1) == number and (pattern >> (length - 2) & 1) == number:
+                continue
+            stack.append((pattern | number << length, length + 1, new_ones))
+
+    patterns.sort()
+    return patterns
+
+def cache_path(size, cache_directory):
+    return os.path.join(cache_directory, 'lines%02d.bin' % size)
+
+# Loads the patterns of a size from the disk cache, or returns None if they aren't cached
+def read_cache(size, cache_directory):
+    path = cache_path(size, cache_directory)
+    try:
+        file = open(path, 'rb')
+    except OSError:
+        return None
+
+    patterns = array.array('Q')
+    try:
+        patterns.frombytes(file.read())
+    except ValueError: # truncated file
+        return None
+    finally:
+        file.close()
+    return patterns
+
+# Saves the patterns of a size, written to a temporary file first so other processes never read half a file
+def write_cache(size, patterns, cache_directory):
+    path = cache_path(size, cache_directory)
+    temporary_path = path + '.%d.tmp' % os.getpid()
+    try:
+        os.makedirs(cache_directory, exist_ok = True)
+        file = open(temporary_path, 'wb')
+        file.write(array.array('Q', patterns).tobytes())
+        file.close()
+        os.replace(temporary_path, path)
+    except OSError: # the cache is only an optimisation
+        pass
+
+
+class LineSolver():
+    '''Solves a puzzle by filtering the legal lines of its size against the filled cells of every row and column'''
+
+    def __init__(self, bitboard, should_stop = None):
+        self.size = bitboard.size
+        self.full = bitboard.full
+        self.should_stop = should_stop # called with the iterations so far, returns True to abandon the search
+        self.iterations = 0
+        self.stopped = False # should_stop ended the search while the candidates were being filtered
+
+        # a large size has close to a million legal lines, so filtering them checks should_stop as it goes
+        patterns = legal_lines(self.size)
+        self.rows = []
+        self.columns = []
+        for lines, lines_ones, lines_filled in ((self.rows, bitboard.row_ones, bitboard.row_filled),
+                (self.columns, bitboard.column_ones, bitboard.column_filled)):
+            for index in range(self.size):
+                candidates = self.matching(patterns, lines_ones[index], lines_filled[index])
+                if candidates == None:
+                    self.stopped = True
+                    return
+                lines.append(candidates)
+
+    # Keeps the patterns that agree with the filled cells of a line, returns None if the search should stop
+    def matching(self, patterns, ones, filled):
+        candidates = []
+        for start in range(0, len(patterns), MATCH_CHUNK):
+            if self.should_stop != None and self.should_stop(self.iterations):
+                return None
+            candidates.extend([pattern for pattern in patterns[start:start + MATCH_CHUNK] if pattern & filled == ones])
+        return candidates
+
+    # Solves the puzzle, returns up to limit solutions as lists of row patterns
+    def solve(self, limit = 1):
+        self.limit = limit
+        self.solutions = []
+        if not self.stopped:
+            self.search(self.rows, self.columns)
+        return self.solutions
+
+    # Returns True once enough solutions have been found or the search should stop
+    def search(self, rows, columns):
+        if self.should_stop != None and self.should_stop(self.iterations):
+            return True
+
+        # candidate lists are replaced, never changed in place, so a shallow copy is enough to backtrack
+        rows = list(rows)
+        columns = list(columns)
+        if not self.propagate(rows, columns):
+            return self.should_stop != None and self.should_stop(self.iterations)
+
+        # branch on the undecided line with the fewest candidates
+        best = None
+        for lines in (rows, columns):
+            for index in range(self.size):
+                if len(lines[index]) > 1 and (best == None or len(lines[index]) < len(best[0][best[1]])):
+                    best = (lines, index)
+        if best == None:
+            self.solutions.append([candidates[0] for candidates in rows])
+            return len(self.solutions) >= self.limit
+
+        lines, index = best
+        saved = lines[index]
+        for pattern in saved:
+            self.iterations += 1
+            lines[index] = [pattern]
+            if self.search(rows, columns):
+                return True
+        return False
+
+    # Intersects candidates across rows and columns until nothing changes, returns False on a contradiction
+    def propagate(self, rows, columns):
+        size = self.size
+        queue = list(range(2 * size)) # rows are 0 to size-1 and columns are size to 2*size-1
+        queued = [True] * (2 * size)
+
+        while queue:
+            if self.should_stop != None and self.should_stop(self.iterations):
+                return False
+
+            line = queue.pop()
+            queued[line] = False
+            if line < size:
+                lines, crossing, index, offset = rows, columns, line, size
+            else:
+                lines, crossing, index, offset = columns, rows, line - size, 0
+
+            candidates = lines[index]
+            if not candidates:
+                return False
+
+            # cells that are the same in every candidate
+            common_ones = self.full
+            common_zeros = self.full
+            for pattern in candidates:
+                common_ones &= pattern
+                common_zeros &= ~pattern
+            decided = common_ones | common_zeros
+
+            # filter the crossing lines at the decided cells
+            bit = 1 << index
+            while decided:
+                position_bit = decided & -decided
+                decided ^= position_bit
+                position = position_bit.bit_length() - 1
+                wanted = bit if common_ones & position_bit else 0
+
+                others = crossing[position]
+                filtered = [pattern for pattern in others if pattern & bit == wanted]
+                if len(filtered) != len(others):
+                    crossing[position] = filtered
+                    if not filtered:
+                        return False
+                    if not queued[position + offset]:
+                        queued[position + offset] = True
+                        queue.append(position + offset)
+
+            # a decided line can't appear in any other line of the same direction
+            if len(candidates) == 1:
+                pattern = candidates[0]
+                for other in range(size):
+                    if other != index and pattern in lines[other]:
+                        lines[other] = [candidate for candidate in lines[other] if candidate != pattern]
+                        if not lines[other]:
+                            return False
+                        other_line = other if line < size else other + size
+                        if not queued[other_line]:
+                            queued[other_line] = True
+                            queue.append(other_line)
+
+        return True
+
+    # Converts solved row patterns to a list of lists of strings
+    def to_grid(self, rows):
+        return [[str(pattern >> column & 1) for column in range(self.size)] for pattern in rows]
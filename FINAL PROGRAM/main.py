@@ -1,12 +1,15 @@
 import sys
 import os
 import time
-import threading
-import copy
 import pygame
 
 # custom library
 from button import *
+from solver import load_puzzle
+from replay import MoveLog, Replay
+from worker import SolveWorker
+from solution_cache import open_cache
+from validator import MoveValidator
 
 pygame.init()
 clock = pygame.time.Clock()
@@ -20,6 +23,7 @@ pygame.display.set_caption('BINARY PUZZLE')
 # Colours
 WHITE = (240,240,240)
 PINK = (242,5,116)
+RED = (110,20,40)
 GREEN = (5,242,131)
 LIGHT_GREY = (100,100,100)
 GREY = (50,51,48)
@@ -30,6 +34,9 @@ BLACK = (22,23,20)
 puzzle_path = '14V.txt' # the filepath of the puzzle
 debug_font = pygame.font.SysFont("Arial", 16)
 debug_font_colour = (255,0,255)
+worker = SolveWorker() # solves in a separate process, started on the first solve and kept for the next ones
+solutions = open_cache() # solutions of puzzles solved before, shared by every symmetry of a puzzle
+fps_rect = pygame.Rect(0, 0, 60, 24) # area cleared for the fps counter each frame
 
 # Classes
 class Square():
@@ -39,12 +46,16 @@ class Square():
     inner_border_colour = WHITE
     hovered_colour = PINK
     uneditable_colour = LIGHT_GREY
+    error_colour = RED # in a row or column that breaks a rule
+    empty_colour = DARK_GREY # same as the board
     font_colour = WHITE
     
     possible_values = ('_','0','1') # possible values to cycle through when clicking
 
-    def __init__(self, position, dimensions, border_width, font, value):
-        self.font = font
+    glyph_cache = {} # pre-rendered '0' and '1' by font size, shared by every square and puzzle
+
+    def __init__(self, position, dimensions, border_width, glyphs, value):
+        self.glyphs = glyphs
 
         self.position = position
         self.dimensions = dimensions
@@ -55,34 +66,63 @@ class Square():
 
         self.editable = (value  == '_') # bool if the square can be edited by the player
         self.hovered = False
+        self.error = False
+        self.dirty = True # needs drawing on the next frame
 
         self.rect = pygame.Rect(position, dimensions)
-        self.text_surface = font.render(self.value, True, self.font_colour)
-        self.text_rect = self.text_surface.get_rect(center = self.rect.center) # stores text position 
+        self.text_rects = {value: glyph.get_rect(center = self.rect.center) for value, glyph in glyphs.items()} # stores text positions
+
+    # Returns the rendered digits for a font size, rendering them the first time the size is used
+    @classmethod
+    def load_glyphs(cls, font_size):
+        if font_size not in cls.glyph_cache:
+            font = pygame.font.SysFont("Arial", font_size)
+            cls.glyph_cache[font_size] = {value: font.render(value, True, cls.font_colour) for value in ('0','1')}
+        return cls.glyph_cache[font_size]
 
-    # Draws the square to the screen (called every frame)
+    # Draws the background and border of the square, returns its (text, position) for the puzzle to blit or None if empty
     def draw(self, surface):
         if not self.editable:
             pygame.draw.rect(surface, self.uneditable_colour, self.rect)
         elif self.hovered:
             pygame.draw.rect(surface, self.hovered_colour, self.rect)
-            self.hovered = False
+        elif self.error:
+            pygame.draw.rect(surface, self.error_colour, self.rect)
+        else:
+            pygame.draw.rect(surface, self.empty_colour, self.rect)
         
         pygame.draw.rect(surface, self.inner_border_colour, self.rect, self.border_width)
-
-        self.text_surface = self.font.render(self.value.replace('_',''), True, self.font_colour)
-        self.text_rect = self.text_surface.get_rect(center = self.rect.center)
-        surface.blit(self.text_surface, self.text_rect) 
-        ## could this be optimised by drawing all of the text at once using surface.blits() ?
+        self.dirty = False
+
+        if self.value in self.glyphs:
+            return (self.glyphs[self.value], self.text_rects[self.value])
+        return None
+
+    # Changes the value, the square is only redrawn if it is different
+    def set_value(self, value):
+        if value != self.value:
+            self.value = value
+            self.value_index = self.possible_values.index(value)
+            self.dirty = True
+
+    def set_hovered(self, hovered):
+        if hovered != self.hovered:
+            self.hovered = hovered
+            self.dirty = True
+
+    def set_error(self, error):
+        if error != self.error:
+            self.error = error
+            self.dirty = True
     
-    # Cycles through possible values when left clicked and sets to 0 when right clicked
+    # Returns the value a click changes the square to, cycling when left clicked and emptying when right clicked
     def clicked(self, click_type):
         if self.editable:
             if click_type == 'LEFT':
-                self.value_index = (self.value_index+1) % len(self.possible_values) # increments the value cyclically within the array's bounds
+                return self.possible_values[(self.value_index+1) % len(self.possible_values)] # increments the value cyclically within the array's bounds
             elif click_type == 'RIGHT':
-                self.value_index = 0
-            self.value = self.possible_values[self.value_index] # redefines stored value
+                return self.possible_values[0]
+        return self.value
 
 
 class Puzzle():
@@ -93,15 +133,18 @@ class Puzzle():
     solved_border_colour = GREEN
     board_colour = DARK_GREY
 
-    solve_delay = 0.01 # seconds
-    max_draw_steps = 200 # max total iterations to solve without sacrificing visuals is this value -1 (525)
-    total_solve_iterations = 525
-    solved_board = None
-    is_player_solve = False
+    replay_duration = 3 # seconds the solve animation takes, however long the solve itself took
+    replay = None # plays the moves of the player's solve onto the squares
+    log = None # moves of the player's solve received so far
+    solve_job = None # job number of the solve in the worker, messages about other jobs are ignored
+    is_solving = False
 
-    def __init__(self, path):
+    def __init__(self, path, worker, cache = None):
+        self.worker = worker
+        self.cache = cache
         self.input_path = os.path.join('puzzles', path)
-        self.size, self.starting_board = self.load_puzzle()
+        self.starting_board = load_puzzle(self.input_path)
+        self.size = len(self.starting_board)
 
         # dynamic UI based on window resolution
         self.grid_spacing = min(RESOLUTION) / 6
@@ -114,7 +157,7 @@ class Puzzle():
         self.board_dimensions = (self.size * self.square_size, self.size * self.square_size) 
         self.border_width = max(1, round(self.square_size / 24))
         self.outer_border_width = self.border_width * 3
-        self.square_font = pygame.font.SysFont("Arial",round(self.square_size/2))
+        self.square_glyphs = Square.load_glyphs(round(self.square_size/2))
 
         # offset to center the board
         self.offset = (
@@ -129,33 +172,19 @@ class Puzzle():
             self.offset[1] - self.outer_border_width/2,
             self.board_dimensions[0] + self.outer_border_width,
             self.board_dimensions[1] + self.outer_border_width)
+        self.inner_rect = self.outer_border_rect.inflate(-2 * self.outer_border_width, -2 * self.outer_border_width) # inside the outline, squares are clipped to it
+
+        # what has been drawn, so only changes are drawn again
+        self.hovered_square = None
+        self.drawn_solved = None # None until the first frame draws everything
 
         # store all the instatiated squares (2D Array/Matrix)
         self.board = self.create_squares(self.starting_board)
 
-        # initial solve, stores total number of iterations and final solved board
-        self.start_solve()
-
-    # Loads puzzle from the given path, stores puzzle size and initial values
-    def load_puzzle(self):
-        file = open(self.input_path,'r')
-        data = file.readlines()
-        file.close()
-
-        size = len(data)
-
-        # stub
-        if size % 2 != 0 or size < 6 or size > 14:
-            print("Invalid Puzzle File")
-
-        loaded_board = []
-        for line in data:
-            line = line.strip()
-            line = line.replace(' ','')
-            line = line.split(',')
-            loaded_board.append(line)
-        
-        return size, loaded_board
+        # checks the rules as squares change, so the puzzle doesn't have to be solved to know when the player has
+        self.validator = MoveValidator(self.starting_board)
+        for line in range(2 * self.size):
+            self.mark_errors(line)
 
     # Create and return all the squares
     def create_squares(self, loaded_board):
@@ -171,7 +200,7 @@ class Puzzle():
                     square_pos,
                     square_size,
                     self.border_width, 
-                    self.square_font, 
+                    self.square_glyphs, 
                     square_value
                     )
 
@@ -179,39 +208,86 @@ class Puzzle():
             matrix.append(row)
         return matrix
     
-    # Draws the board, outline and squares (called every frame)
+    # Draws the squares and outline that changed since the last frame, returns the rectangles of the screen to update
     def update(self, surface, mouse_position, click_type):
+        self.poll_solve()
+        self.play_replay()
         self.mouse_check(mouse_position, click_type)
-        
-        pygame.draw.rect(surface, self.board_colour, self.board_rect) # draws background
-        
+        dirty_rects = []
+
+        # first frame
+        if self.drawn_solved == None:
+            pygame.draw.rect(surface, self.board_colour, self.board_rect) # draws background
+            dirty_rects.append(self.outer_border_rect)
 
-        # draw all squares
+        # draw changed squares, all the text at once
+        surface.set_clip(self.inner_rect)
+        text = []
         for row in self.board:
             for square in row:
-                square.draw(surface)
-
-        # check if solved
-        solved = (self.solved_board != None)
-        if solved:
-            for row in range(self.size):
-                for column in range(self.size):
-                    if self.board[row][column].value != self.solved_board[row][column]:
-                        solved = False
-
-        if solved:
-            pygame.draw.rect(surface, self.solved_border_colour, self.outer_border_rect, self.outer_border_width) # draws puzzle outline
+                if square.dirty or self.drawn_solved == None:
+                    square_text = square.draw(surface)
+                    if square_text != None:
+                        text.append(square_text)
+                    dirty_rects.append(square.rect.clip(self.inner_rect))
+        surface.blits(text, doreturn = False)
+        surface.set_clip(None)
+
+        solved = self.is_solved()
+        if solved != self.drawn_solved:
+            self.drawn_solved = solved
+            if solved:
+                pygame.draw.rect(surface, self.solved_border_colour, self.outer_border_rect, self.outer_border_width) # draws puzzle outline
+            else:
+                pygame.draw.rect(surface, self.outer_border_colour, self.outer_border_rect, self.outer_border_width) # draws puzzle outline
+            dirty_rects.append(self.outer_border_rect)
+
+        return dirty_rects
+
+    def is_solved(self):
+        return self.validator.solved()
+
+    # Changes a square and checks its row and column
+    def set_square(self, row, column, value):
+        self.board[row][column].set_value(value)
+        for line in self.validator.set(row, column, value):
+            self.mark_errors(line)
+
+    # Shows which squares of a line are in a row or column that breaks a rule
+    def mark_errors(self, line):
+        errors = self.validator.errors
+        if line < self.size:
+            cells = [(line, column) for column in range(self.size)]
         else:
-            pygame.draw.rect(surface, self.outer_border_colour, self.outer_border_rect, self.outer_border_width) # draws puzzle outline
+            cells = [(row, line - self.size) for row in range(self.size)]
+        for row, column in cells:
+            self.board[row][column].set_error(errors[row] != None or errors[self.size + column] != None)
+
+    # Fills in the next square the rules force, returns the hint or None if there isn't one
+    def play_hint(self):
+        hint = self.validator.hint()
+        if hint != None:
+            row, column, value, rule = hint
+            self.set_square(row, column, value)
+        return hint
 
     # Detects mouse hover and clicks
     def mouse_check(self, mouse_position, click_type):
         square_position = self.mouse_to_square(mouse_position)
+        hovered_square = None
         if square_position != None:
-            self.board[square_position[1]][square_position[0]].hovered = True
+            x, y = square_position
+            hovered_square = self.board[y][x]
 
             if click_type != None:
-                self.board[square_position[1]][square_position[0]].clicked(click_type)
+                self.set_square(y, x, hovered_square.clicked(click_type))
+
+        if hovered_square is not self.hovered_square:
+            if self.hovered_square != None:
+                self.hovered_square.set_hovered(False)
+            if hovered_square != None:
+                hovered_square.set_hovered(True)
+            self.hovered_square = hovered_square
                    
     # Converts mouse position to matrix coordinates    
     def mouse_to_square(self,mouse_position):
@@ -223,160 +299,58 @@ class Puzzle():
         else:
             return None
 
-    # Creates a new thread for solving and begins the solving process
+    # Solves the puzzle for the player, recorded at full speed by the worker process and played back by update
     def start_solve(self):
-        self.solved = False # stops thread once the puzzle is solved
-        self.is_solving = True # prevents multiple threads at once
-
-        self.solving_board = copy.deepcopy(self.starting_board)
-        self.current_solve_iterations = 0
-
-        self.stop_thread = False
-
-        if __name__ == "__main__": # if the file that is run is this file
-            self.solve_thread = threading.Thread(target=self.solve_manual, daemon=True)
-            self.solve_thread.start()
-            print('Thread Started')
-        
-
-    # Fills in squares using basic logic
-    def solve_manual(self):
-        board = self.solving_board
-        empty = '_'
-        fixed = True
-        while fixed:
-            print('Manual Looped')
-            fixed = False
+        self.log = MoveLog(self.size)
+        self.replay = Replay(self.log, self.starting_board, self.replay_duration)
+        for row in range(self.size):
+            for column in range(self.size):
+                self.set_square(row, column, self.starting_board[row][column])
+
+        # a puzzle solved before (or a symmetry of one) plays its cached solution back square by square
+        cached_board = self.cache.get(self.starting_board) if self.cache != None else None
+        if cached_board != None:
             for row in range(self.size):
                 for column in range(self.size):
-                    square = board[row][column]
-
-                    if square != empty:
-                        # horizontal two in a row
-                        if column + 1 < self.size and square == board[row][column+1]:
-                            if column > 0 and board[row][column-1] == empty:
-                                board[row][column-1] = self.toggle(square)
-                                self.draw_step(board)
-                                fixed = True
-                            if column < self.size -2 and board[row][column+2] == empty:
-                                board[row][column+2] = self.toggle(square)
-                                self.draw_step(board)
-                                fixed = True
-                        
-                        #vertical two in a row
-                        if row + 1 < self.size and square == board[row+1][column]:
-                            if row > 0 and board[row-1][column] == empty:
-                                board[row-1][column] = self.toggle(square)
-                                self.draw_step(board)
-                                fixed = True
-                            if row < self.size -2 and board[row+2][column] == empty:
-                                board[row+2][column] = self.toggle(square)
-                                self.draw_step(board)
-                                fixed = True
-                        
-                        #potential triplets horizontal
-                        if column + 2 < self.size and square == board[row][column+2]:
-                            if board[row][column+1] == empty:
-                                board[row][column+1] = self.toggle(square)
-                                self.draw_step(board)
-                                fixed = True
-
-                        #potential triplets vertical
-                        if row + 2 < self.size and square == board[row+2][column]:
-                            if board[row+1][column] == empty:
-                                board[row+1][column] = self.toggle(square)
-                                self.draw_step(board)
-                                fixed = True
-
-        print('Finished Manual')
-        self.recursive_solve()
-
-    # Searches for possible solutions to a given starting board using recursive backtracking
-    def recursive_solve(self):
-        if not self.stop_thread: # stops thread if needed
-            for row in range(self.size): 
-                for column in range(self.size):
-                    if self.solving_board[row][column] == '_':
-                        for number in range(2):
-                            if not self.solved: #prevents the puzzle from being reset once the puzzle is solved
-                                self.current_solve_iterations += 1
-                                self.solving_board[row][column] = str(number) # tries new value
-
-                                # draws frames evenly across iterations for a max of max_draw_steps (always draws last frame)
-                                if (self.is_player_solve and 
-                                        (self.current_solve_iterations % max(round(self.total_solve_iterations / (self.max_draw_steps/1.5)), 1) == 0 or
-                                        self.current_solve_iterations == self.total_solve_iterations)):
-                                    self.draw_step(self.solving_board)
-
-                                # recurses if the new board is possible
-                                if self.possible(self.solving_board, row, column, str(number)): # test if the new number is possible
-                                    self.recursive_solve()
-                                    
-                                if not self.solved: # prevents the puzzle from being reset once the puzzle is solved
-                                    self.solving_board[row][column] = '_'
-                        return
-                        
-            self.solved = True
+                    if self.starting_board[row][column] == '_':
+                        self.log.placed(row, column, int(cached_board[row][column]))
+            return
+
+        self.is_solving = True # prevents multiple solves at once
+        self.solve_job = self.worker.submit(self.starting_board, record = True)
+
+    # Handles the messages from the worker about this puzzle's solve (called every frame)
+    def poll_solve(self):
+        for message in self.worker.poll():
+            if message.get('job') != self.solve_job:
+                continue # from a solve that was cancelled
+            if message['type'] == 'moves':
+                self.log.extend(message['moves'])
+            elif message['type'] == 'done':
+                self.is_solving = False
+                if message['board'] != None and self.cache != None:
+                    self.cache.put(self.starting_board, message['board'])
+                print('Solve Finished | Status:', message['status'], '| Iterations:', message['iterations'])
+
+    # Stops the player's solve and puts the starting board back
+    def restart(self):
+        if self.is_solving:
+            self.worker.cancel(self.solve_job)
+            self.solve_job = None
             self.is_solving = False
-
-            self.total_solve_iterations = copy.deepcopy(self.current_solve_iterations)
-            self.solved_board = copy.deepcopy(self.solving_board)
-            print('Thread Finished | Iterations:', self.current_solve_iterations)
-
-    # Draws the board during solve
-    def draw_step(self, current_board):
-        if self.is_player_solve:
-            time.sleep(self.solve_delay)
-            for row in range(self.size):
-                for column in range(self.size):
-                    self.board[row][column].value = current_board[row][column]
-                    self.board[row][column].value_index = self.board[row][column].possible_values.index(current_board[row][column])
-    
-    # Checks if a given board state follows the rules of binary puzzles
-    def possible(self, board, row, column, number):
-        consecutiveX = 0 # 3 in a row x
-        consecutiveY = 0 # 3 in a row y
-        countX = 0 # amount in row
-        countY = 0 # amount in column
-
-        current_row = board[row]
-        for i in range(self.size):
-            # 3 in a row for rows & more than half total
-            if current_row[i] == number: 
-                consecutiveX += 1
-                countX += 1
-                if consecutiveX >= 3 or countX > self.size/2:
-                    return False
-            else: consecutiveX = 0
-            
-            # 3 in a row for columns & more than half total
-            if board[i][column] == number: 
-                consecutiveY += 1
-                countY += 1
-                if consecutiveY >= 3 or countY > self.size/2:
-                    return False
-            else: consecutiveY = 0
-            
-        # unique rows test
-        times = 0
-        if current_row.count('_') == 0:
-            for i in board:
-                if i.count('_') == 0:
-                    if current_row == i:
-                        times += 1
-                        if times >= 2:
-                            return False
-        
-        return True
-
-    # Returns the opposite value (binary) if a value is given.
-    def toggle(self, current):
-        if current == '0':
-            return '1'
-        elif current == '1':
-            return '0'
-        else:
-            return None
+        self.replay = None
+        for row in range(self.size):
+            for column in range(self.size):
+                self.set_square(row, column, self.starting_board[row][column])
+
+    # Copies the moves of the solve that are due this frame onto the squares
+    def play_replay(self):
+        if self.replay != None:
+            changes = self.replay.advance(time.perf_counter(), not self.is_solving)
+            for (row, column), value in changes.items():
+                self.set_square(row, column, value)
+            if self.replay.finished:
+                self.replay = None
 
 # Global Functions
 def update_fps():
@@ -385,14 +359,18 @@ def update_fps():
     return fps_text
 
 def restart_method(object):
-    object.stop_thread = True
-    main()
+    object.restart()
 
 def solve_method(object):
-    if not object.is_solving:
-        object.is_player_solve = True
+    if not object.is_solving and object.replay == None:
         object.start_solve()
 
+def hint_method(object):
+    if not object.is_solving and object.replay == None:
+        hint = object.play_hint()
+        if hint != None:
+            print('Hint | Row:', hint[0], '| Column:', hint[1], '| Value:', hint[2], '| Rule:', hint[3])
+
 # Scenes
 def splash_screen():
     bg_colour = BLACK
@@ -438,7 +416,7 @@ def splash_screen():
 
 def main():
     bg_colour = BLACK
-    puzzle = Puzzle(puzzle_path)
+    puzzle = Puzzle(puzzle_path, worker, solutions)
     UI_font = pygame.font.Font(os.path.join('assets','font.ttf'), round(puzzle.button_spacing / 2.5))
 
     # Buttons
@@ -467,9 +445,12 @@ def main():
         WHITE
         )
     
+    SCREEN.fill(bg_colour)
+    first_frame = True
+
     # GAME LOOP
     while True:
-        SCREEN.fill(bg_colour)
+        SCREEN.fill(bg_colour, fps_rect)
         SCREEN.blit(update_fps(), (5,2))
 
         # Input
@@ -491,6 +472,8 @@ def main():
                     solve_method(puzzle)
                 if event.key == pygame.K_r:
                     restart_method(puzzle)
+                if event.key == pygame.K_h:
+                    hint_method(puzzle)
 
             # mouse input        
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
@@ -498,18 +481,24 @@ def main():
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 3:
                 click_type = 'RIGHT'
 
-        # Visuals
-        puzzle.update(SCREEN, mouse_position, click_type)
+        # Visuals (only the parts of the screen that changed are updated)
+        dirty_rects = puzzle.update(SCREEN, mouse_position, click_type)
 
         restart_button.detect(mouse_position, restart_method, puzzle)
         solve_button.detect(mouse_position, solve_method, puzzle)
         restart_button.draw(SCREEN)
         solve_button.draw(SCREEN)
+        dirty_rects += [fps_rect, restart_button.button_rect, solve_button.button_rect]
         
-        pygame.display.flip()
+        if first_frame:
+            pygame.display.flip()
+            first_frame = False
+        else:
+            pygame.display.update(dirty_rects)
         clock.tick(FPS)
 
 # First scene to load
-splash_screen()
-#main()
+if __name__ == "__main__":
+    splash_screen()
+    #main()
 
@@ -0,0 +1,164 @@
+import sys
+import os
+import time
+import queue
+import argparse
+import multiprocessing
+from collections import deque
+
+# custom library
+from bitboard import BitBoard
+from propagation import Propagator
+from solver import Solver, load_puzzle, MODES, BACKTRACK, CONSTRAINED, SOLVED, UNSOLVABLE, TIMEOUT, NODE_LIMIT, CANCELLED
+
+SPLIT_FACTOR = 4 # subproblems made for each worker before the pool starts
+SLICE_NODES = 2000 # search nodes a job runs before handing back the parts it hasn't searched
+POLL_INTERVAL = 0.05 # seconds between checks of the clock and the cancel event while waiting for jobs
+
+cancel_event = None # set in every worker process by start_worker, tells running jobs to stop
+
+
+def start_worker(event):
+    global cancel_event
+    cancel_event = event
+
+# Solves one subproblem (runs in a worker process).
+# Returns (status, solutions, search nodes, unexplored parts if the job ran out of nodes).
+def solve_part(grid, mode, solution_limit, node_limit):
+    solver = Solver(grid, mode = mode, node_limit = node_limit, cancel_event = cancel_event, solution_limit = solution_limit)
+    solver.run()
+    parts = solver.unexplored() if solver.status == NODE_LIMIT else []
+    return solver.status, solver.solutions, solver.current_solve_iterations, parts
+
+# Expands the top of the search tree breadth first, guessing both values of the most constrained cell,
+# until there are count subproblems or the tree runs out. Returns (subproblems, solutions found on the way).
+def split(grid, count):
+    parts = deque([grid])
+    solutions = []
+    while parts and len(parts) < count:
+        bitboard = BitBoard(parts.popleft())
+        propagator = Propagator(bitboard)
+        propagator.push_all()
+        if not propagator.propagate():
+            continue
+        cell = bitboard.most_constrained()
+        board = bitboard.to_grid()
+        if cell == None:
+            solutions.append(board)
+            continue
+        for number in ('0', '1'):
+            part = [list(row) for row in board]
+            part[cell[0]][cell[1]] = number
+            parts.append(part)
+    return list(parts), solutions
+
+# Solves a grid on every core, returns the solved board or None
+def parallel_solve(grid, mode = CONSTRAINED, jobs = None, time_limit = None):
+    return ParallelSolver(grid, mode = mode, jobs = jobs, time_limit = time_limit).run()
+
+
+class ParallelSolver():
+    '''Solves one puzzle on a process pool. The top of the search tree is split into subproblems, and a job
+    that runs past slice_nodes hands back the parts it hasn't searched, so no worker sits idle while
+    another has a large part left. Every job is cancelled once enough solutions are found.'''
+
+    def __init__(self, grid, mode = CONSTRAINED, jobs = None, solution_limit = 1, time_limit = None, cancel_event = None, slice_nodes = SLICE_NODES):
+        if mode not in MODES:
+            raise ValueError('Unknown search mode: ' + str(mode))
+        self.grid = grid
+        self.mode = mode
+        self.jobs = jobs or os.cpu_count()
+        self.solution_limit = solution_limit
+        self.time_limit = time_limit # seconds, None for no limit
+        self.cancel_event = cancel_event # anything with is_set(), stops the solve when set
+        # only the cell searches can hand back their unexplored parts, the other modes run each part to the end
+        self.slice_nodes = slice_nodes if mode in (BACKTRACK, CONSTRAINED) else None
+
+        self.solutions = []
+        self.status = None
+        self.solving_board = None
+        self.current_solve_iterations = 0
+        self.parts = 0 # subproblems solved, including the ones split off during the solve
+
+    # Runs the solve, returns the first solution found or None (the reason is in status)
+    def run(self):
+        deadline = time.perf_counter() + self.time_limit if self.time_limit != None else None
+        parts, self.solutions = split(self.grid, SPLIT_FACTOR * self.jobs)
+        if parts and len(self.solutions) < self.solution_limit:
+            self.search(parts, deadline)
+
+        del self.solutions[self.solution_limit:]
+        if self.status == None:
+            self.status = SOLVED if self.solutions else UNSOLVABLE
+        if self.solutions:
+            self.solving_board = self.solutions[0]
+        return self.solving_board if self.status == SOLVED else None
+
+    def search(self, parts, deadline):
+        event = multiprocessing.Event()
+        results = queue.Queue() # filled by the pool's result thread
+        pool = multiprocessing.Pool(self.jobs, start_worker, (event,))
+        pending = 0
+        try:
+            while True:
+                for part in parts:
+                    pool.apply_async(solve_part, (part, self.mode, self.solution_limit - len(self.solutions), self.slice_nodes),
+                        callback = results.put, error_callback = results.put)
+                    pending += 1
+                if not pending:
+                    return
+
+                try:
+                    result = results.get(timeout = POLL_INTERVAL)
+                except queue.Empty:
+                    if deadline != None and time.perf_counter() >= deadline:
+                        self.status = TIMEOUT
+                        return
+                    if self.cancel_event != None and self.cancel_event.is_set():
+                        self.status = CANCELLED
+                        return
+                    parts = []
+                    continue
+                if isinstance(result, BaseException):
+                    raise result
+
+                pending -= 1
+                self.parts += 1
+                status, solutions, nodes, parts = result
+                self.current_solve_iterations += nodes
+                self.solutions.extend(solutions)
+                if len(self.solutions) >= self.solution_limit:
+                    return
+        finally:
+            # stops the running jobs, then the workers
+            event.set()
+            pool.terminate()
+            pool.join()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Solve one hard puzzle on several cores.')
+    parser.add_argument('puzzle', help = 'puzzle file')
+    parser.add_argument('-j', '--jobs', type = int, default = os.cpu_count(), help = 'number of worker processes (default: all cores)')
+    parser.add_argument('--mode', choices = MODES, default = CONSTRAINED, help = 'search mode of the solver')
+    parser.add_argument('--count', type = int, metavar = 'LIMIT', help = 'count solutions, stopping once LIMIT are found')
+    parser.add_argument('--time-limit', type = float, help = 'seconds to give up after')
+    args = parser.parse_args(argv)
+
+    grid = load_puzzle(args.puzzle)
+    start = time.perf_counter()
+    solver = ParallelSolver(grid, mode = args.mode, jobs = args.jobs, solution_limit = args.count or 1, time_limit = args.time_limit)
+    board = solver.run()
+    elapsed = time.perf_counter() - start
+
+    if args.count:
+        print('Solutions:', len(solver.solutions), '(' + solver.status + ')')
+    elif board != None:
+        for row in board:
+            print(', '.join(row))
+    else:
+        print('No solution:', solver.status)
+    print('%.3f seconds, %d search nodes in %d parts on %d processes' % (elapsed, solver.current_solve_iterations, solver.parts, solver.jobs))
+    return 0 if solver.status == SOLVED else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
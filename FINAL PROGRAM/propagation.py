@@ -0,0 +1,198 @@
+from collections import deque
+
+# custom library
+from instrumentation import PAIRS, COUNT, COMPLETIONS
+
+
+class Propagator():
+    '''Applies the binary puzzle rules to the rows and columns of a BitBoard until nothing changes'''
+
+    def __init__(self, bitboard, on_assign = None, instrument = None, log = None):
+        self.bitboard = bitboard
+        self.size = bitboard.size
+        self.half = bitboard.half
+        self.full = bitboard.full
+        self.on_assign = on_assign # called after every cell filled in by propagation
+        self.instrument = instrument # optional Instrument told which rule filled in how many cells
+        self.rule = None # rule behind the last result of line_forced
+        self.log = log # optional MoveLog that records every cell placed and cleared
+
+        # lines waiting to be checked, rows are 0 to size-1 and columns are size to 2*size-1
+        self.queue = deque()
+        self.queued = [False] * (2 * self.size)
+
+        self.trail = [] # every cell filled in by propagation, in order (row, column)
+        self.propagations = 0 # cells forced by the rules
+
+    # Queues every row and column
+    def push_all(self):
+        for line in range(2 * self.size):
+            self.push_line(line)
+
+    # Queues the row and column through a cell. A cell that fills its row (or column) also queues the other rows
+    # (or columns) with one of a digit left, the new full line can rule out one of their completions.
+    def push_cell(self, row, column):
+        bitboard = self.bitboard
+        self.push_line(row)
+        self.push_line(self.size + column)
+        if bitboard.row_filled[row] == self.full:
+            self.push_one_left(bitboard.row_ones, bitboard.row_filled, 0)
+        if bitboard.column_filled[column] == self.full:
+            self.push_one_left(bitboard.column_ones, bitboard.column_filled, self.size)
+
+    def push_one_left(self, lines_ones, lines_filled, first_line):
+        for index in range(self.size):
+            filled = lines_filled[index]
+            if filled == self.full:
+                continue
+            ones = lines_ones[index].bit_count()
+            if ones == self.half - 1 or (filled.bit_count() - ones) == self.half - 1:
+                self.push_line(first_line + index)
+
+    def push_line(self, line):
+        if not self.queued[line]:
+            self.queued[line] = True
+            self.queue.append(line)
+
+    # Fills in every cell forced by the rules, returns False if the board breaks a rule
+    def propagate(self):
+        bitboard = self.bitboard
+        size = self.size
+        queue = self.queue
+
+        while queue:
+            line = queue.popleft()
+            self.queued[line] = False
+
+            if line < size:
+                forced = self.line_forced(bitboard.row_ones[line], bitboard.row_filled[line], bitboard.complete_rows)
+            else:
+                forced = self.line_forced(bitboard.column_ones[line - size], bitboard.column_filled[line - size], bitboard.complete_columns)
+            if forced == None:
+                self.clear_queue()
+                return False
+            if self.instrument != None and (forced[0] or forced[1]):
+                self.instrument.propagated(self.rule, (forced[0] | forced[1]).bit_count())
+
+            for number in range(2):
+                mask = forced[number]
+                while mask:
+                    bit = mask & -mask
+                    mask ^= bit
+                    position = bit.bit_length() - 1
+                    if line < size:
+                        row, column = line, position
+                    else:
+                        row, column = position, line - size
+
+                    self.propagations += 1
+                    if not self.assign(row, column, number):
+                        self.clear_queue()
+                        return False
+
+        return True
+
+    # Fills in a cell, records it on the trail and queues its row and column, returns False if it breaks a rule
+    def assign(self, row, column, number):
+        if not self.place(row, column, number):
+            return False
+        self.push_cell(row, column)
+        return True
+
+    # Fills in a cell and records it on the trail without queueing anything, returns False if it breaks a rule
+    def place(self, row, column, number):
+        self.bitboard.set(row, column, number)
+        self.trail.append((row, column))
+        if self.log != None:
+            self.log.placed(row, column, number)
+        if self.on_assign != None:
+            self.on_assign()
+        return self.bitboard.possible(row, column)
+
+    def clear_queue(self):
+        while self.queue:
+            self.queued[self.queue.popleft()] = False
+
+    # Empties every cell filled in by propagation since the trail had the given length
+    def undo(self, length = 0):
+        while len(self.trail) > length:
+            row, column = self.trail.pop()
+            self.bitboard.clear(row, column)
+            if self.log != None:
+                self.log.cleared(row, column)
+
+    # Returns (zeros, ones) masks of the empty cells forced in a line, or None if the line breaks a rule
+    def line_forced(self, ones, filled, signatures):
+        full = self.full
+        zeros = filled & ~ones
+        empty = full & ~filled
+
+        # three in a row already
+        if ones & (ones >> 1) & (ones >> 2) or zeros & (zeros >> 1) & (zeros >> 2):
+            return None
+
+        ones_left = self.half - ones.bit_count()
+        zeros_left = self.half - zeros.bit_count()
+        if ones_left < 0 or zeros_left < 0:
+            return None
+
+        # balanced full lines only need to be unique
+        if not empty:
+            if signatures[ones] > 1:
+                return None
+            return 0, 0
+
+        # count completion, one digit is used up
+        self.rule = COUNT
+        if ones_left == 0:
+            return empty, 0
+        if zeros_left == 0:
+            return 0, empty
+
+        # one digit almost used up, try every place it could go
+        if ones_left == 1 or zeros_left == 1:
+            self.rule = COMPLETIONS
+            return self.line_completions(ones, empty, ones_left == 1, signatures)
+
+        # pairs and sandwiches
+        self.rule = PAIRS
+        pairs = ones & (ones >> 1)
+        sandwiches = ones & (ones >> 2)
+        to_zero = ((pairs >> 1) | (pairs << 2) | (sandwiches << 1)) & empty
+        pairs = zeros & (zeros >> 1)
+        sandwiches = zeros & (zeros >> 2)
+        to_one = ((pairs >> 1) | (pairs << 2) | (sandwiches << 1)) & empty
+
+        if to_zero & to_one:
+            return None
+        return to_zero, to_one
+
+    # Finds the cells that are the same in every legal completion of a line with one of a digit left to place
+    def line_completions(self, ones, empty, last_is_one, signatures):
+        full = self.full
+        common_ones = full # set where every completion has a one
+        any_ones = 0 # set where any completion has a one
+
+        remaining = empty
+        while remaining:
+            bit = remaining & -remaining
+            remaining ^= bit
+
+            # the last digit goes in this cell and the other digit fills the rest
+            if last_is_one:
+                completion = ones | bit
+            else:
+                completion = ones | (empty & ~bit)
+            zeros = full & ~completion
+
+            if completion & (completion >> 1) & (completion >> 2) or zeros & (zeros >> 1) & (zeros >> 2):
+                continue
+            if completion in signatures: # would copy a full line
+                continue
+
+            common_ones &= completion
+            any_ones |= completion
+
+        if not any_ones: # every completion breaks a rule (a completion always holds some ones)
+            return None
+        return empty & ~any_ones, empty & common_ones
@@ -0,0 +1,83 @@
+import time
+import array
+
+# values stored in a move log, a placed digit is stored as itself
+CLEARED = 2
+
+DEFAULT_DURATION = 3 # seconds a replay of a finished solve takes
+MIN_RATE = 30 # moves per second, so short solves aren't played too fast
+FRAME_BUDGET = 0.004 # seconds one advance may spend applying moves, the rest of a 60 FPS frame is left for drawing
+BUDGET_CHECK_MOVES = 256 # moves applied between checks of the clock
+
+
+class MoveLog():
+    '''Every change a solve makes to the board, each packed into one integer: (row * size + column) * 3 + value'''
+
+    def __init__(self, size):
+        self.size = size
+        self.moves = array.array('l')
+
+    def placed(self, row, column, number):
+        self.moves.append((row * self.size + column) * 3 + number)
+
+    def cleared(self, row, column):
+        self.moves.append((row * self.size + column) * 3 + CLEARED)
+
+    # Adds moves already packed, e.g. received from a worker process
+    def extend(self, moves):
+        self.moves.extend(moves)
+
+    def __len__(self):
+        return len(self.moves)
+
+    # Returns move index as (row, column, value) with value '_', '0' or '1'
+    def get(self, index):
+        cell, value = divmod(self.moves[index], 3)
+        row, column = divmod(cell, self.size)
+        return row, column, '_' if value == CLEARED else str(value)
+
+
+class Replay():
+    '''Plays a MoveLog back at a steady pace (the log may still be growing while it plays)'''
+
+    def __init__(self, log, grid, duration = DEFAULT_DURATION):
+        self.log = log
+        self.board = [list(row) for row in grid] # the board as far as the replay has got
+        self.duration = duration
+        self.position = 0 # moves applied so far
+        self.due = 0 # moves that should have been applied by now, fractional
+        self.last_time = None
+        self.finished = False
+
+    # Applies the moves due by now, returns {(row, column): value} of the cells that changed.
+    # complete tells the replay the solve has finished, so it can finish once it reaches the end of the log.
+    def advance(self, now, complete = False):
+        moves = len(self.log)
+        if self.last_time == None:
+            self.last_time = now
+
+        # plays the log in about duration seconds, speeding up as the log grows
+        rate = max(moves / self.duration, MIN_RATE)
+        self.due = min(self.due + rate * (now - self.last_time), moves)
+        self.last_time = now
+
+        # a log too long to play in the duration within the frame budget takes longer instead
+        end = int(self.due)
+        deadline = time.perf_counter() + FRAME_BUDGET
+        changes = {}
+        board = self.board
+        position = self.position
+        while position < end:
+            block_end = min(end, position + BUDGET_CHECK_MOVES)
+            for index in range(position, block_end):
+                row, column, value = self.log.get(index)
+                if board[row][column] != value:
+                    board[row][column] = value
+                    changes[(row, column)] = value
+            position = block_end
+            if time.perf_counter() >= deadline:
+                break
+        self.position = position
+
+        self.finished = complete and self.position == moves
+        return changes
@@ -0,0 +1,550 @@
+import sys
+import heapq
+import argparse
+
+EMPTY = '_'
+
+RESTART_UNIT = 64 # conflicts in the shortest run between restarts, runs follow the Luby sequence
+FIRST_REDUCE = 2000 # learnt clauses kept before the worst half are first deleted
+REDUCE_GROWTH = 300 # learnt clauses allowed on top of that after each deletion
+ACTIVITY_DECAY = 0.95
+ACTIVITY_LIMIT = 1e100 # activities are scaled down past this so they stay floats
+
+
+# A puzzle is encoded in DIMACS numbering: cell (row, column) is variable row * size + column + 1,
+# true meaning 1. Literals are +variable or -variable, extra variables come after the cells.
+def cell_variable(size, row, column):
+    return row * size + column + 1
+
+# Returns (variable count, clauses) for every rule of a grid: no three in a row, half of each digit in
+# every line (totalizers) and no two equal rows or columns, with the givens as unit clauses
+def encode(grid, distinct = True):
+    encoder = Encoder(grid)
+    encoder.add_line_rules()
+    if distinct:
+        for lines in (encoder.rows, encoder.columns):
+            for first in range(len(lines)):
+                for second in range(first + 1, len(lines)):
+                    encoder.add_distinct(lines[first], lines[second])
+    return encoder.variable_count, encoder.clauses
+
+# Returns the grid a model (truth value of every variable, indexed from 1) gives the cells of a size
+def decode(model, size):
+    return [['1' if model[cell_variable(size, row, column)] else '0' for column in range(size)] for row in range(size)]
+
+# Writes clauses in DIMACS CNF to an open file
+def write_dimacs(file, variable_count, clauses, comments = ()):
+    for comment in comments:
+        file.write('c %s\n' % comment)
+    file.write('p cnf %d %d\n' % (variable_count, len(clauses)))
+    for clause in clauses:
+        file.write(' '.join([str(literal) for literal in clause]) + ' 0\n')
+
+# Solves a grid with the clause learning engine, returns (solved board or None, the CDCL solver)
+def sat_solve(grid, should_stop = None):
+    encoder = Encoder(grid)
+    encoder.add_line_rules()
+    solver = CDCL(encoder.variable_count, encoder.clauses, encoder.size * encoder.size)
+    board = None
+    for model in solve_distinct(encoder, solver, should_stop):
+        board = decode(model, encoder.size)
+        break
+    return board, solver
+
+# Yields the model of every solution of an encoded grid (the caller stops when it has enough).
+# The distinct lines rule is added lazily: most pairs of lines can't end up equal anyway, so only
+# the pairs a model has made equal get their clauses, then the same solver carries on.
+def solve_distinct(encoder, solver, should_stop = None):
+    while True:
+        solver.add_clauses(encoder.take_clauses(), encoder.variable_count)
+        result = solver.solve(should_stop)
+        if result != True:
+            return
+
+        model = solver.model
+        equal = encoder.equal_lines(model)
+        if equal:
+            for first, second in equal:
+                encoder.add_distinct(first, second)
+            continue
+
+        yield model
+        # blocks this solution so the next solve finds another one
+        encoder.clauses.append([-variable if model[variable] else variable for variable in encoder.free_cells()])
+
+
+class Encoder():
+    '''Builds the clauses of a grid's rules, leaving out what the givens already satisfy'''
+
+    def __init__(self, grid):
+        self.size = len(grid)
+        self.half = self.size // 2
+        self.variable_count = self.size * self.size
+        self.clauses = []
+        self.taken = 0 # clauses already handed to a solver by take_clauses
+
+        self.rows = [[cell_variable(self.size, row, column) for column in range(self.size)] for row in range(self.size)]
+        self.columns = [[cell_variable(self.size, row, column) for row in range(self.size)] for column in range(self.size)]
+        self.distinct_pairs = set() # pairs of lines whose distinct clauses have been added
+
+        self.fixed = {} # variable: True or False for every given cell
+        for row in range(self.size):
+            for column in range(self.size):
+                if grid[row][column] != EMPTY:
+                    variable = cell_variable(self.size, row, column)
+                    self.fixed[variable] = grid[row][column] == '1'
+                    self.clauses.append([variable if self.fixed[variable] else -variable])
+
+    def new_variable(self):
+        self.variable_count += 1
+        return self.variable_count
+
+    # Adds a clause without the literals the givens make false, or nothing if a given makes it true
+    def add(self, literals):
+        clause = []
+        for literal in literals:
+            value = self.fixed.get(abs(literal))
+            if value == None:
+                clause.append(literal)
+            elif value == (literal > 0):
+                return
+        self.clauses.append(clause)
+
+    # Returns the clauses added since the last call
+    def take_clauses(self):
+        clauses = self.clauses[self.taken:]
+        self.taken = len(self.clauses)
+        return clauses
+
+    def free_cells(self):
+        return [variable for variable in range(1, self.size * self.size + 1) if variable not in self.fixed]
+
+    def add_line_rules(self):
+        for line in self.rows + self.columns:
+            # no three in a row: three cells are neither all 1 nor all 0
+            for start in range(self.size - 2):
+                cells = line[start:start + 3]
+                self.add(cells)
+                self.add([-variable for variable in cells])
+
+            # the empty cells hold exactly the ones and zeros the line still needs
+            free = [variable for variable in line if variable not in self.fixed]
+            ones = sum([1 for variable in line if self.fixed.get(variable) == True])
+            self.exactly(free, self.half - ones)
+
+    # Exactly k of the literals are true, as a totalizer: a tree of unary counters whose root says how many are
+    def exactly(self, literals, k):
+        if k < 0 or k > len(literals):
+            self.add([]) # the givens already break the count
+            return
+        if k == 0 or k == len(literals):
+            for literal in literals:
+                self.add([literal if k else -literal])
+            return
+        counts = self.count(literals, k + 1)
+        self.add([counts[k - 1]])
+        self.add([-counts[k]])
+
+    # Returns literals where literal j is true if at least j+1 of the literals are, counting no higher than limit
+    def count(self, literals, limit):
+        if len(literals) == 1:
+            return literals
+        middle = len(literals) // 2
+        left = self.count(literals[:middle], limit)
+        right = self.count(literals[middle:], limit)
+        counts = [self.new_variable() for j in range(min(len(literals), limit))]
+        for i in range(len(left) + 1):
+            for j in range(len(right) + 1):
+                # at least i on the left and j on the right makes at least i+j
+                if 0 < i + j <= len(counts):
+                    clause = [counts[i + j - 1]]
+                    if i > 0:
+                        clause.append(-left[i - 1])
+                    if j > 0:
+                        clause.append(-right[j - 1])
+                    self.add(clause)
+                # fewer than i+1 on the left and j+1 on the right makes fewer than i+j+1
+                if i + j < len(counts):
+                    clause = [-counts[i + j]]
+                    if i < len(left):
+                        clause.append(left[i])
+                    if j < len(right):
+                        clause.append(right[j])
+                    self.add(clause)
+        return counts
+
+    # Two lines differ in at least one cell
+    def add_distinct(self, first, second):
+        if (first[0], second[0]) in self.distinct_pairs:
+            return
+        self.distinct_pairs.add((first[0], second[0]))
+
+        differences = [] # a literal for each cell that is true if the lines differ there
+        for a, b in zip(first, second):
+            a_value = self.fixed.get(a)
+            b_value = self.fixed.get(b)
+            if a_value != None and b_value != None:
+                if a_value != b_value:
+                    return # the givens already differ
+            elif a_value != None:
+                differences.append(-b if a_value else b)
+            elif b_value != None:
+                differences.append(-a if b_value else a)
+            else:
+                difference = self.new_variable()
+                self.add([-difference, a, b])
+                self.add([-difference, -a, -b])
+                differences.append(difference)
+        self.add(differences)
+
+    # Returns the pairs of rows and of columns a model makes equal
+    def equal_lines(self, model):
+        equal = []
+        for lines in (self.rows, self.columns):
+            seen = {}
+            for line in lines:
+                values = tuple([model[variable] for variable in line])
+                if values in seen:
+                    equal.append((seen[values], line))
+                else:
+                    seen[values] = line
+        return equal
+
+
+class CDCL():
+    '''A conflict-driven clause learning SAT solver: two watched literals, first-UIP learning, VSIDS
+    branching with saved phases, Luby restarts and deletion of the least useful learnt clauses'''
+
+    def __init__(self, variable_count = 0, clauses = (), first_variables = 0):
+        # literal codes: variable v is 2v when true and 2v+1 when false, so code ^ 1 negates a literal
+        self.variable_count = 0
+        self.values = [0, 0] # by literal code: 1 true, -1 false, 0 unassigned
+        self.levels = [0] # decision level each variable was assigned at
+        self.reasons = [None] # clause that forced each variable, None for decisions
+        self.watches = [[], []] # by literal code: clauses watching that literal
+        self.activity = [0.0]
+        self.phases = [False] # last value of each variable, tried first when it is decided
+        self.seen = [False]
+        self.first_variables = first_variables # variables 1 to this are decided before any other, e.g. a puzzle's cells
+        self.heap = [] # (tier, -activity, variable), entries go stale and are skipped when popped
+        self.increment = 1.0
+
+        self.trail = [] # literal codes in the order they were assigned
+        self.trail_limits = [] # trail length where each decision level starts
+        self.head = 0 # trail position propagation has reached
+        self.learnts = [] # (lbd, clause)
+        self.max_learnts = FIRST_REDUCE
+        self.unsatisfiable = False
+        self.model = None
+
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+        self.restarts = 0
+        self.add_clauses(clauses, variable_count)
+
+    def add_variables(self, variable_count):
+        for variable in range(self.variable_count + 1, variable_count + 1):
+            self.values.extend((0, 0))
+            self.levels.append(0)
+            self.reasons.append(None)
+            self.watches.extend(([], []))
+            self.activity.append(0.0)
+            self.phases.append(False)
+            self.seen.append(False)
+            heapq.heappush(self.heap, (variable > self.first_variables, 0.0, variable))
+        self.variable_count = max(self.variable_count, variable_count)
+
+    # Adds DIMACS clauses, the solver goes back to level 0 first so it can keep going from where it was
+    def add_clauses(self, clauses, variable_count = 0):
+        self.add_variables(variable_count)
+        self.backtrack(0)
+        for literals in clauses:
+            self.add_clause(literals)
+
+    def add_clause(self, literals):
+        if self.unsatisfiable:
+            return
+        values = self.values
+        clause = []
+        for literal in literals:
+            code = 2 * literal if literal > 0 else -2 * literal + 1
+            if values[code] == 1 or code ^ 1 in clause:
+                return # true at level 0 or always true
+            if values[code] == 0 and code not in clause:
+                clause.append(code)
+
+        if not clause:
+            self.unsatisfiable = True
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            if self.propagate() != None:
+                self.unsatisfiable = True
+        else:
+            self.watches[clause[0]].append(clause)
+            self.watches[clause[1]].append(clause)
+
+    def assign(self, code, reason):
+        variable = code >> 1
+        self.values[code] = 1
+        self.values[code ^ 1] = -1
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(code)
+
+    # Unassigns everything above a decision level, saving the values as phases
+    def backtrack(self, level):
+        if len(self.trail_limits) <= level:
+            return
+        values = self.values
+        reasons = self.reasons
+        phases = self.phases
+        activity = self.activity
+        heap = self.heap
+        first_variables = self.first_variables
+        start = self.trail_limits[level]
+        for code in self.trail[start:]:
+            variable = code >> 1
+            values[code] = 0
+            values[code ^ 1] = 0
+            reasons[variable] = None
+            phases[variable] = not code & 1
+            heapq.heappush(heap, (variable > first_variables, -activity[variable], variable))
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.head = start
+
+    # Assigns everything the clauses force, returns a clause with every literal false or None
+    def propagate(self):
+        values = self.values
+        watches = self.watches
+        trail = self.trail
+        level = len(self.trail_limits)
+        levels = self.levels
+        reasons = self.reasons
+
+        while self.head < len(trail):
+            false_code = trail[self.head] ^ 1
+            self.head += 1
+            self.propagations += 1
+            watching = watches[false_code]
+            kept = 0
+            index = 0
+            count = len(watching)
+            while index < count:
+                clause = watching[index]
+                index += 1
+                # the false literal goes second, the other watched literal first
+                if clause[0] == false_code:
+                    clause[0] = clause[1]
+                    clause[1] = false_code
+                first = clause[0]
+                if values[first] == 1:
+                    watching[kept] = clause
+                    kept += 1
+                    continue
+
+                # looks for another literal that isn't false to watch
+                for position in range(2, len(clause)):
+                    code = clause[position]
+                    if values[code] != -1:
+                        clause[1] = code
+                        clause[position] = false_code
+                        watches[code].append(clause)
+                        break
+                else:
+                    watching[kept] = clause
+                    kept += 1
+                    if values[first] == -1:
+                        # conflict, the clauses not looked at yet stay watched
+                        while index < count:
+                            watching[kept] = watching[index]
+                            kept += 1
+                            index += 1
+                        del watching[kept:]
+                        return clause
+                    # unit, the first literal is forced
+                    values[first] = 1
+                    values[first ^ 1] = -1
+                    levels[first >> 1] = level
+                    reasons[first >> 1] = clause
+                    trail.append(first)
+            del watching[kept:]
+        return None
+
+    # Returns (learnt clause with the literal it asserts first, level to backtrack to, lbd)
+    def analyze(self, conflict):
+        seen = self.seen
+        levels = self.levels
+        reasons = self.reasons
+        trail = self.trail
+        level = len(self.trail_limits)
+
+        learnt = [None]
+        pending = 0 # literals of the conflict level still to be resolved
+        index = len(trail) - 1
+        clause = conflict
+        code = None
+        while True:
+            for other in (clause if code == None else clause[1:]):
+                variable = other >> 1
+                if not seen[variable] and levels[variable] > 0:
+                    seen[variable] = True
+                    self.bump(variable)
+                    if levels[variable] == level:
+                        pending += 1
+                    else:
+                        learnt.append(other)
+
+            # the most recent seen literal on the trail is resolved on next
+            while not seen[trail[index] >> 1]:
+                index -= 1
+            code = trail[index]
+            index -= 1
+            seen[code >> 1] = False
+            pending -= 1
+            if pending == 0:
+                break
+            clause = reasons[code >> 1]
+        learnt[0] = code ^ 1
+
+        # drops literals implied by the rest of the clause
+        kept = [learnt[0]]
+        for other in learnt[1:]:
+            reason = reasons[other >> 1]
+            if reason == None or not all([seen[literal >> 1] or levels[literal >> 1] == 0 for literal in reason[1:]]):
+                kept.append(other)
+        for other in learnt[1:]:
+            seen[other >> 1] = False
+        learnt = kept
+
+        # the literal of the highest level after the asserted one is watched second, it is where the solve goes back to
+        backtrack_level = 0
+        if len(learnt) > 1:
+            highest = max(range(1, len(learnt)), key = lambda position: levels[learnt[position] >> 1])
+            learnt[1], learnt[highest] = learnt[highest], learnt[1]
+            backtrack_level = levels[learnt[1] >> 1]
+        lbd = len(set([levels[literal >> 1] for literal in learnt]))
+        return learnt, backtrack_level, lbd
+
+    def bump(self, variable):
+        activity = self.activity
+        activity[variable] += self.increment
+        if activity[variable] > ACTIVITY_LIMIT:
+            for index in range(len(activity)):
+                activity[index] /= ACTIVITY_LIMIT
+            self.increment /= ACTIVITY_LIMIT
+            self.rebuild_heap()
+        elif self.values[2 * variable] == 0:
+            heapq.heappush(self.heap, (variable > self.first_variables, -activity[variable], variable))
+
+    def rebuild_heap(self):
+        self.heap = [(variable > self.first_variables, -self.activity[variable], variable) for variable in range(1, self.variable_count + 1) if self.values[2 * variable] == 0]
+        heapq.heapify(self.heap)
+
+    # Returns the unassigned variable with the highest activity as a literal code with its saved phase, or None
+    def decide(self):
+        heap = self.heap
+        values = self.values
+        activity = self.activity
+        if len(heap) > 4 * self.variable_count + 1000:
+            self.rebuild_heap()
+            heap = self.heap
+        while heap:
+            tier, key, variable = heapq.heappop(heap)
+            if values[2 * variable] == 0 and -key == activity[variable]:
+                return 2 * variable if self.phases[variable] else 2 * variable + 1
+        return None
+
+    # Deletes the worse half of the learnt clauses, at level 0 so none of them is a reason
+    def reduce(self):
+        self.learnts.sort(key = lambda learnt: learnt[0])
+        half = len(self.learnts) // 2
+        deleted = set([id(clause) for lbd, clause in self.learnts[half:] if lbd > 2])
+        self.learnts = [learnt for learnt in self.learnts if id(learnt[1]) not in deleted]
+        for index in range(len(self.watches)):
+            self.watches[index] = [clause for clause in self.watches[index] if id(clause) not in deleted]
+        self.max_learnts += REDUCE_GROWTH
+
+    # Solves the clauses added so far. Returns True with the model in model, False if there is no solution,
+    # or None if should_stop (called with the decisions so far after every conflict) returned True.
+    def solve(self, should_stop = None):
+        if self.unsatisfiable:
+            return False
+        restart_count = 0
+        conflicts_left = RESTART_UNIT * luby(restart_count)
+
+        while True:
+            conflict = self.propagate()
+            if conflict != None:
+                self.conflicts += 1
+                conflicts_left -= 1
+                if not self.trail_limits:
+                    self.unsatisfiable = True
+                    return False
+                learnt, backtrack_level, lbd = self.analyze(conflict)
+                self.backtrack(backtrack_level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.watches[learnt[0]].append(learnt)
+                    self.watches[learnt[1]].append(learnt)
+                    self.learnts.append((lbd, learnt))
+                    self.assign(learnt[0], learnt)
+                self.increment /= ACTIVITY_DECAY
+
+                if should_stop != None and should_stop(self.decisions):
+                    return None
+                continue
+
+            if conflicts_left <= 0:
+                self.restarts += 1
+                restart_count += 1
+                conflicts_left = RESTART_UNIT * luby(restart_count)
+                self.backtrack(0)
+                if len(self.learnts) > self.max_learnts:
+                    self.reduce()
+                continue
+
+            code = self.decide()
+            if code == None:
+                self.model = [False] + [self.values[2 * variable] == 1 for variable in range(1, self.variable_count + 1)]
+                return True
+            self.decisions += 1
+            self.trail_limits.append(len(self.trail))
+            self.assign(code, None)
+
+
+# Returns term number index (from 0) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, 1, 2, ...
+def luby(index):
+    size = 1
+    sequence = 0
+    while size < index + 1:
+        sequence += 1
+        size = 2 * size + 1
+    while size - 1 != index:
+        size = (size - 1) // 2
+        sequence -= 1
+        index %= size
+    return 2 ** sequence
+
+def main(argv = None):
+    from solver import load_puzzle
+
+    parser = argparse.ArgumentParser(description = 'Write the rules of a binary puzzle as DIMACS CNF.')
+    parser.add_argument('puzzle', help = 'puzzle file')
+    parser.add_argument('-o', '--output', help = 'CNF file to write (default: standard output)')
+    args = parser.parse_args(argv)
+
+    grid = load_puzzle(args.puzzle)
+    variable_count, clauses = encode(grid)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    write_dimacs(output, variable_count, clauses, (
+        'binary puzzle %s, %dx%d' % (args.puzzle, len(grid), len(grid)),
+        'variable row * %d + column + 1 is the cell at (row, column), true means 1' % len(grid)))
+    if output is not sys.stdout:
+        output.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
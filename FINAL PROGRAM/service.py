@@ -0,0 +1,336 @@
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+from collections import deque
+
+# custom library
+from solver import parse_puzzle, check_grid, MODES, AUTO, TIMEOUT, CANCELLED
+from worker import WORKER_PATH, FAILED, CANCEL_GRACE
+
+# Requests and responses are JSON, one per line, answered in the order the solves finish:
+#   {"id": 1, "puzzle": "0, _, 1, _\n...", "mode": "constrained", "timeout": 5}  puzzle in the puzzles/ file format
+#   {"id": 2, "grid": ["0_1_", ...]}  or a grid, rows as strings or lists of '_', '0' and '1'
+#   {"id": 3, "type": "stats"}  the live counters
+# Answers:
+#   {"id": 1, "status": "solved", "board": ["0110", ...] or null, "iterations": 7, "time": 0.012, "coalesced": false}
+#   {"id": 3, "stats": {...}}
+#   {"id": 4, "error": "..."}  a request that couldn't be read, or "busy" when the queue is full
+
+DEFAULT_PORT = 8765
+DEFAULT_TIMEOUT = 30 # seconds a request waits for its solve
+DEFAULT_MAX_QUEUE = 1000 # solves waiting for a worker before new ones are turned away
+MAX_IN_FLIGHT = 64 # requests of one connection being solved at once, it isn't read further until one finishes
+LATENCY_WINDOW = 1000 # latest requests the percentiles are taken over
+BUSY = 'busy'
+
+
+# Returns the grid of a request as a list of lists of strings, raises ValueError if it isn't a valid puzzle
+def request_grid(request):
+    if 'puzzle' in request:
+        return parse_puzzle(str(request['puzzle']))
+    if 'grid' in request and isinstance(request['grid'], list):
+        grid = [list(row) for row in request['grid']]
+        check_grid(grid)
+        return grid
+    raise ValueError('a request needs a "puzzle" or a "grid"')
+
+# Returns the value at a fraction (0 to 1) of sorted values, or None if there are none
+def percentile(values, fraction):
+    if not values:
+        return None
+    return values[int(round(fraction * (len(values) - 1)))]
+
+
+class Job():
+    '''One solve, shared by every request for the same grid and mode while it runs'''
+
+    def __init__(self, key, grid, mode):
+        self.key = key
+        self.grid = grid
+        self.mode = mode
+        self.result = asyncio.get_running_loop().create_future() # the worker's done message
+        self.waiters = 0 # requests still waiting for the result
+        self.cancelled = False # no request is waiting any more
+
+
+class WorkerProcess():
+    '''A worker.py process driven from asyncio, kept running between solves so they don't pay to start it'''
+
+    def __init__(self):
+        self.process = None
+        self.messages = None # filled by a task reading the process output
+        self.job = 0
+
+    async def start(self):
+        if self.process != None and self.process.returncode == None:
+            return
+        self.process = await asyncio.create_subprocess_exec(sys.executable, WORKER_PATH,
+            stdin = asyncio.subprocess.PIPE, stdout = asyncio.subprocess.PIPE)
+        self.messages = asyncio.Queue()
+        asyncio.ensure_future(self.read(self.process, self.messages))
+
+    async def read(self, process, messages):
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break
+            messages.put_nowait(json.loads(line))
+        messages.put_nowait(None) # the process has ended
+
+    def send(self, message):
+        try:
+            self.process.stdin.write((json.dumps(message) + '\n').encode())
+        except (OSError, RuntimeError): # the process has died, read() reports its end
+            pass
+
+    # Solves a job and returns the worker's done message. A job cancelled while it runs is cancelled in the
+    # worker, and the process is killed (and started again next time) if the solve ignores the cancel.
+    async def solve(self, job):
+        await self.start()
+        self.job += 1
+        self.send({'type': 'solve', 'job': self.job, 'grid': job.grid, 'mode': job.mode})
+
+        cancel_time = None
+        while True:
+            try:
+                message = await asyncio.wait_for(self.messages.get(), 0.05)
+            except asyncio.TimeoutError:
+                if job.cancelled and cancel_time == None:
+                    cancel_time = time.perf_counter()
+                    self.send({'type': 'cancel', 'job': self.job})
+                elif cancel_time != None and time.perf_counter() - cancel_time > CANCEL_GRACE:
+                    await self.kill()
+                    return {'type': 'done', 'job': self.job, 'status': CANCELLED, 'board': None, 'iterations': 0}
+                continue
+            if message == None:
+                self.process = None
+                return {'type': 'done', 'job': self.job, 'status': FAILED, 'board': None, 'iterations': 0}
+            if message['type'] == 'done' and message['job'] == self.job:
+                return message
+
+    async def kill(self):
+        if self.process != None:
+            if self.process.returncode == None:
+                self.process.kill()
+            await self.process.wait()
+            self.process = None
+
+    async def close(self):
+        if self.process == None:
+            return
+        self.process.stdin.close() # cancels everything in the worker
+        try:
+            await asyncio.wait_for(self.process.wait(), CANCEL_GRACE)
+        except asyncio.TimeoutError:
+            await self.kill()
+        self.process = None
+
+
+class SolveService():
+    '''Answers JSON Lines solve requests from a fleet of warm worker processes. Identical requests made while
+    one of them is being solved share its solve, a full queue turns new solves away and every request has a timeout.'''
+
+    def __init__(self, workers = None, max_queue = DEFAULT_MAX_QUEUE, default_timeout = DEFAULT_TIMEOUT):
+        self.workers = [WorkerProcess() for index in range(workers or os.cpu_count())]
+        self.max_queue = max_queue
+        self.default_timeout = default_timeout
+        self.queue = None # jobs waiting for a worker, created in start() so it belongs to the running loop
+        self.jobs = {} # jobs queued or running, by (mode, grid)
+        self.tasks = []
+
+        # counters
+        self.started = time.time()
+        self.requests = 0
+        self.coalesced = 0 # requests answered by a solve another request started
+        self.rejected = 0 # turned away because the queue was full
+        self.running = 0
+        self.statuses = {} # requests answered, by status
+        self.latencies = deque(maxlen = LATENCY_WINDOW) # seconds from request to answer
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        for worker in self.workers:
+            await worker.start()
+            self.tasks.append(asyncio.ensure_future(self.run_worker(worker)))
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        for worker in self.workers:
+            await worker.close()
+
+    # Hands queued jobs to one worker, one at a time
+    async def run_worker(self, worker):
+        while True:
+            job = await self.queue.get()
+            if job.cancelled:
+                continue
+            self.running += 1
+            try:
+                message = await worker.solve(job)
+            except Exception as error: # keeps the worker's task alive for the next job
+                message = {'type': 'done', 'status': FAILED, 'board': None, 'iterations': 0, 'error': str(error)}
+            finally:
+                self.running -= 1
+            if self.jobs.get(job.key) is job:
+                del self.jobs[job.key]
+            if not job.result.done():
+                job.result.set_result(message)
+
+    # Answers one request
+    async def handle(self, request):
+        answer = {'id': request.get('id')}
+        if request.get('type') == 'stats':
+            answer['stats'] = self.stats()
+            return answer
+
+        start = time.perf_counter()
+        self.requests += 1
+        try:
+            grid = request_grid(request)
+            mode = request.get('mode', AUTO)
+            if mode not in MODES:
+                raise ValueError('Unknown search mode: ' + str(mode))
+            timeout = float(request.get('timeout', self.default_timeout))
+        except (ValueError, TypeError) as error:
+            answer['error'] = str(error)
+            return answer
+
+        # a request for a grid already being solved waits for that solve instead of starting another
+        key = (mode, ''.join([''.join(row) for row in grid]))
+        job = self.jobs.get(key)
+        answer['coalesced'] = job != None
+        if job != None:
+            self.coalesced += 1
+        else:
+            if self.queue.qsize() >= self.max_queue:
+                self.rejected += 1
+                answer['error'] = BUSY
+                return answer
+            job = Job(key, grid, mode)
+            self.jobs[key] = job
+            self.queue.put_nowait(job)
+
+        job.waiters += 1
+        try:
+            message = await asyncio.wait_for(asyncio.shield(job.result), timeout)
+            status = message['status']
+            answer['status'] = status
+            answer['board'] = [''.join(row) for row in message['board']] if message.get('board') != None else None
+            answer['iterations'] = message.get('iterations', 0)
+        except asyncio.TimeoutError:
+            status = TIMEOUT
+            answer['status'] = TIMEOUT
+            answer['board'] = None
+        finally:
+            job.waiters -= 1
+            if job.waiters == 0 and not job.result.done():
+                # nobody wants the result any more, the queued or running solve is dropped
+                job.cancelled = True
+                if self.jobs.get(key) is job:
+                    del self.jobs[key]
+
+        elapsed = time.perf_counter() - start
+        answer['time'] = round(elapsed, 6)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latencies.append(elapsed)
+        return answer
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        p50 = percentile(latencies, 0.5)
+        p99 = percentile(latencies, 0.99)
+        return {
+            'uptime': round(time.time() - self.started, 3),
+            'workers': len(self.workers),
+            'queue_depth': self.queue.qsize(),
+            'running': self.running,
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'rejected': self.rejected,
+            'statuses': self.statuses,
+            'p50': round(p50, 6) if p50 != None else None,
+            'p99': round(p99, 6) if p99 != None else None,
+            }
+
+    # Serves one connection: reads requests while fewer than MAX_IN_FLIGHT of them are unanswered
+    async def serve(self, reader, writer):
+        in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+        pending = set()
+
+        async def answer(request):
+            try:
+                response = await self.handle(request)
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                await in_flight.acquire()
+                line = await reader.readline()
+                if not line:
+                    in_flight.release()
+                    break
+                if not line.strip():
+                    in_flight.release()
+                    continue
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError('a request is a JSON object')
+                except ValueError as error:
+                    writer.write((json.dumps({'id': None, 'error': str(error)}) + '\n').encode())
+                    in_flight.release()
+                    continue
+                task = asyncio.ensure_future(answer(request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+        except ConnectionError:
+            pass
+        finally:
+            for task in pending:
+                task.cancel()
+            writer.close()
+
+async def serve(host = '127.0.0.1', port = DEFAULT_PORT, socket_path = None, workers = None, max_queue = DEFAULT_MAX_QUEUE, default_timeout = DEFAULT_TIMEOUT):
+    service = SolveService(workers, max_queue, default_timeout)
+    await service.start()
+    if socket_path != None:
+        server = await asyncio.start_unix_server(service.serve, socket_path)
+        print('Serving on', socket_path, 'with', len(service.workers), 'workers', file = sys.stderr)
+    else:
+        server = await asyncio.start_server(service.serve, host, port)
+        print('Serving on %s:%d with %d workers' % (host, port, len(service.workers)), file = sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Serve puzzle solves as JSON Lines over TCP or a Unix socket.')
+    parser.add_argument('--host', default = '127.0.0.1', help = 'address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type = int, default = DEFAULT_PORT, help = 'port to listen on (default: %d)' % DEFAULT_PORT)
+    parser.add_argument('--socket', help = 'listen on this Unix socket instead of a port')
+    parser.add_argument('-j', '--workers', type = int, default = os.cpu_count(), help = 'number of worker processes (default: all cores)')
+    parser.add_argument('--max-queue', type = int, default = DEFAULT_MAX_QUEUE, help = 'solves waiting for a worker before new ones are answered "busy"')
+    parser.add_argument('--timeout', type = float, default = DEFAULT_TIMEOUT, help = 'seconds a request waits unless it gives its own "timeout"')
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.socket, args.workers, args.max_queue, args.timeout))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+import os
+import time
+import sqlite3
+import hashlib
+
+# custom library
+from solver import Solver, AUTO
+
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'solutions.sqlite')
+DEFAULT_MAX_ENTRIES = 100000 # least recently used solutions are removed past this
+EVICT_FRACTION = 0.1 # of max_entries removed at once, so removing isn't needed again for a while
+RECOUNT_INTERVAL = 1000 # puts between exact counts, other processes add solutions to the same file too
+TOUCH_BATCH = 100 # cache hits whose last use is saved together
+
+open_caches = {} # caches already opened in this process, by path
+
+# A symmetry is a number from 0 to 15: bits 0-1 are quarter turns clockwise, bit 2 mirrors the grid
+# first and bit 3 swaps 0 and 1. Every one of them keeps a puzzle's rules, so it maps solutions to solutions.
+SYMMETRIES = range(16)
+COMPLEMENT = {'_': '_', '0': '1', '1': '0'}
+
+
+def rotate(grid):
+    return [list(row) for row in zip(*grid[::-1])]
+
+def mirror(grid):
+    return [row[::-1] for row in grid]
+
+def complement(grid):
+    return [[COMPLEMENT[value] for value in row] for row in grid]
+
+# Returns the grid with a symmetry applied
+def transform(grid, symmetry):
+    if symmetry & 4:
+        grid = mirror(grid)
+    for turn in range(symmetry & 3):
+        grid = rotate(grid)
+    if symmetry & 8:
+        grid = complement(grid)
+    return [list(row) for row in grid]
+
+# Undoes transform(grid, symmetry)
+def untransform(grid, symmetry):
+    if symmetry & 8:
+        grid = complement(grid)
+    for turn in range(-symmetry & 3):
+        grid = rotate(grid)
+    if symmetry & 4:
+        grid = mirror(grid)
+    return [list(row) for row in grid]
+
+def grid_string(grid):
+    return ''.join([''.join(row) for row in grid])
+
+# Returns (canonical string, symmetry) where the string is the smallest of every symmetry of the grid,
+# so a puzzle and all its rotations, mirror images and 0/1 swaps have the same canonical string
+def canonical_form(grid):
+    best = None
+    for symmetry in SYMMETRIES:
+        string = grid_string(transform(grid, symmetry))
+        if best == None or string < best[0]:
+            best = (string, symmetry)
+    return best
+
+# Returns the key of a puzzle in the cache, the same for every symmetry of it
+def puzzle_hash(grid):
+    return canonical_hash(len(grid), canonical_form(grid)[0])
+
+def canonical_hash(size, canonical_string):
+    return hashlib.sha1(('%d:%s' % (size, canonical_string)).encode()).hexdigest()
+
+# Returns the cache at a path, opened once per process
+def open_cache(path = CACHE_PATH, max_entries = DEFAULT_MAX_ENTRIES):
+    if path not in open_caches:
+        open_caches[path] = SolutionCache(path, max_entries)
+    return open_caches[path]
+
+# Solves a grid, looking it up in the cache first and adding it after a solve.
+# Returns (solved board or None, True if it came from the cache).
+def cached_solve(grid, cache, mode = AUTO):
+    solution = cache.get(grid)
+    if solution != None:
+        return solution, True
+    solution = Solver(grid, mode = mode).run()
+    if solution != None:
+        cache.put(grid, solution)
+    return solution, False
+
+
+class SolutionCache():
+    '''Solutions saved in an SQLite file by the canonical form of their puzzle, removing the least recently used past max_entries'''
+
+    def __init__(self, path = CACHE_PATH, max_entries = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok = True)
+
+        # several batch processes can share the file, SQLite locks it while one of them writes
+        self.connection = sqlite3.connect(path, timeout = 30)
+        self.connection.execute('PRAGMA journal_mode = WAL') # readers don't wait for writers, commits are cheaper
+        self.connection.execute('PRAGMA synchronous = NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, size INTEGER, solution TEXT, used REAL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS solutions_used ON solutions (used)')
+        self.connection.commit()
+
+        self.entries = len(self) # estimate, counted again past max_entries or every RECOUNT_INTERVAL puts
+        self.puts = 0
+        self.touched = {} # key: time of the hits not saved yet
+
+    # Returns the solution of a puzzle (in the puzzle's own orientation) or None if it isn't cached
+    def get(self, grid):
+        string, symmetry = canonical_form(grid)
+        key = canonical_hash(len(grid), string)
+        row = self.connection.execute('SELECT solution FROM solutions WHERE key = ?', (key,)).fetchone()
+        if row == None:
+            return None
+
+        # last uses are saved in batches so hits don't each wait for the write lock
+        self.touched[key] = time.time()
+        if len(self.touched) >= TOUCH_BATCH:
+            self.save_touched()
+        size = len(grid)
+        solution = [list(row[0][start:start + size]) for start in range(0, size * size, size)]
+        return untransform(solution, symmetry)
+
+    # Saves the solution of a puzzle, stored in the orientation of the puzzle's canonical form
+    def put(self, grid, solution):
+        string, symmetry = canonical_form(grid)
+        self.connection.execute('INSERT OR REPLACE INTO solutions (key, size, solution, used) VALUES (?, ?, ?, ?)',
+            (canonical_hash(len(grid), string), len(grid), grid_string(transform(solution, symmetry)), time.time()))
+        self.save_touched(commit = False)
+        self.entries += 1 # a replaced solution is counted too, that only makes the next count come sooner
+        self.puts += 1
+        if self.entries > self.max_entries or self.puts % RECOUNT_INTERVAL == 0:
+            self.evict()
+        self.connection.commit()
+
+    # Removes the least recently used solutions once there are more than max_entries, down to
+    # EVICT_FRACTION below it. The used index finds them without reading the other rows.
+    def evict(self):
+        self.entries = len(self)
+        if self.entries <= self.max_entries:
+            return
+        excess = self.entries - int(self.max_entries * (1 - EVICT_FRACTION))
+        self.connection.execute('DELETE FROM solutions WHERE used <= (SELECT used FROM solutions ORDER BY used LIMIT 1 OFFSET ?)',
+            (excess - 1,))
+        self.entries = len(self)
+
+    # Writes the last use of the solutions looked up since the last save
+    def save_touched(self, commit = True):
+        if not self.touched:
+            return
+        self.connection.executemany('UPDATE solutions SET used = ? WHERE key = ?', [(used, key) for key, used in self.touched.items()])
+        self.touched = {}
+        if commit:
+            self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM solutions').fetchone()[0]
+
+    def close(self):
+        self.save_touched()
+        self.connection.close()
+        if open_caches.get(self.path) is self:
+            del open_caches[self.path]
@@ -0,0 +1,342 @@
+import copy
+import time
+
+# custom library
+from bitboard import BitBoard
+from propagation import Propagator
+from lines import LineSolver
+from sat import Encoder, CDCL, solve_distinct, decode
+from instrumentation import MANUAL, SEARCH
+
+EMPTY = '_'
+
+# search modes
+BACKTRACK = 'backtrack' # first empty cell in row-major order, 0 before 1, no deduction after guessing
+CONSTRAINED = 'constrained' # cell in the fullest line, full propagation after every guess
+LINES = 'lines' # candidate legal lines for every row and column, intersected and branched on
+SAT = 'sat' # the rules as clauses, solved by clause learning, for large puzzles
+AUTO = 'auto' # CONSTRAINED up to AUTO_SAT_SIZE, SAT above it where the cell search can take minutes
+MODES = (AUTO, BACKTRACK, CONSTRAINED, LINES, SAT)
+
+AUTO_SAT_SIZE = 14
+
+
+# results of a solve
+SOLVED = 'solved'
+UNSOLVABLE = 'unsolvable'
+TIMEOUT = 'timeout' # ran out of wall-clock time
+NODE_LIMIT = 'node_limit' # ran out of search nodes
+CANCELLED = 'cancelled'
+
+CHECK_INTERVAL = 64 # search nodes between checks of the clock and the cancel event
+
+
+# Loads a puzzle file into a list of lists of strings ('_', '0' or '1')
+def load_puzzle(path):
+    file = open(path,'r')
+    data = file.read()
+    file.close()
+    return parse_puzzle(data, path)
+
+# Reads a puzzle from the text of a puzzle file, name is used in error messages
+def parse_puzzle(text, name = 'puzzle'):
+    loaded_board = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        line = line.replace(' ','')
+        line = line.split(',')
+        loaded_board.append(line)
+
+    check_grid(loaded_board, name)
+    return loaded_board
+
+# Raises ValueError if a grid isn't an even-sized square of '_', '0' and '1'
+def check_grid(grid, name = 'puzzle'):
+    size = len(grid)
+    if size % 2 != 0 or size < 2:
+        raise ValueError('Invalid Puzzle File: %s has %d rows, puzzles need an even size' % (name, size))
+    for line in grid:
+        if len(line) != size:
+            raise ValueError('Invalid Puzzle File: %s is not square' % name)
+        for value in line:
+            if value not in ('_', '0', '1'):
+                raise ValueError('Invalid Puzzle File: %s contains %r' % (name, value))
+
+# Saves a grid in the same format load_puzzle reads
+def save_puzzle(path, grid):
+    file = open(path,'w')
+    for line in grid:
+        file.write(', '.join(line) + '\n')
+    file.close()
+
+# Returns the opposite value (binary) if a value is given.
+def toggle(current):
+    if current == '0':
+        return '1'
+    elif current == '1':
+        return '0'
+    else:
+        return None
+
+# Returns the mode AUTO picks for a puzzle size. The clause learning engine can't shuffle
+# its value order, so a solve with an rng keeps the cell search at any size.
+def auto_mode(size, rng = None):
+    if size > AUTO_SAT_SIZE and rng == None:
+        return SAT
+    return CONSTRAINED
+
+# Solves a grid and returns the solved grid, or None if it has no solution
+def solve(grid, mode = AUTO):
+    return Solver(grid, mode = mode).run()
+
+# Counts the solutions of a grid, stopping once limit are found (limit=2 checks a puzzle has exactly one)
+def count_solutions(grid, limit = 2, mode = AUTO):
+    solver = Solver(grid, mode = mode, solution_limit = limit)
+    solver.run()
+    return len(solver.solutions)
+
+# Solves a grid within the given budgets, returns (status, board) where board is partial unless status is SOLVED
+def solve_limited(grid, mode = AUTO, time_limit = None, node_limit = None, cancel_event = None):
+    solver = Solver(grid, mode = mode, time_limit = time_limit, node_limit = node_limit, cancel_event = cancel_event)
+    solver.run()
+    return solver.status, solver.current_board()
+
+
+class Solver():
+    '''Solves a binary puzzle using logic followed by a backtracking search with an explicit stack'''
+
+    def __init__(self, grid, step_callback = None, mode = AUTO, time_limit = None, node_limit = None, cancel_event = None, solution_limit = 1, rng = None, instrument = None, log = None):
+        if mode not in MODES:
+            raise ValueError('Unknown search mode: ' + str(mode))
+        if mode == AUTO:
+            mode = auto_mode(len(grid), rng)
+
+        self.size = len(grid)
+        self.mode = mode
+        self.givens = copy.deepcopy(grid) # the puzzle as given, solving_board becomes the first solution
+        self.solving_board = copy.deepcopy(grid)
+        self.bitboard = None # created when the solve starts
+        self.propagator = None
+        self.searching = False # True once the manual phase has finished
+        self.stack = [] # guesses of the cell search, kept after it stops so unexplored() can hand out the rest
+        self.step_callback = step_callback # called with the solver after every change to the board
+        self.instrument = instrument # optional Instrument that counts nodes, backtracks, propagations and phase times
+        self.log = log # optional replay.MoveLog of every change to the board, for playing the solve back later
+
+        # budgets, None for no limit
+        self.time_limit = time_limit # seconds
+        self.node_limit = node_limit
+        self.cancel_event = cancel_event # anything with is_set(), e.g. threading.Event or multiprocessing.Event
+        self.deadline = None
+
+        self.rng = rng # random.Random to shuffle the order values are tried in, None for a fixed order
+        self.solution_limit = solution_limit # solutions to find before stopping
+        self.solutions = []
+
+        self.current_solve_iterations = 0
+        self.backtracks = 0 # guesses that broke a rule straight away or after propagating
+        self.checks = 0
+        self.check_interval = 1 if mode == LINES else CHECK_INTERVAL # line search nodes are slow, check every time
+        self.solved = False
+        self.status = None
+        self.stop = False # set from another thread to abandon the solve
+
+    # Runs the full solve, returns the solved board or None (the reason is in status)
+    def run(self):
+        if self.time_limit != None:
+            self.deadline = time.perf_counter() + self.time_limit
+        self.solve_manual()
+        if self.status == None:
+            self.status = SOLVED if self.solved else UNSOLVABLE
+        if self.solved:
+            return self.solving_board
+        return None
+
+    # Stops the solve at the next node
+    def cancel(self):
+        self.stop = True
+
+    # Returns the board as it currently stands
+    def current_board(self):
+        if self.solved or self.bitboard == None:
+            return self.solving_board
+        return self.bitboard.to_grid()
+
+    # Reports a change to the board
+    def step(self):
+        if self.step_callback != None:
+            self.step_callback(self)
+
+    # Checks the budgets and the cancel handle, sets status and returns True if the solve should stop
+    def limit_reached(self, nodes):
+        self.checks += 1
+        if self.stop:
+            self.status = CANCELLED
+        elif self.node_limit != None and nodes >= self.node_limit:
+            self.status = NODE_LIMIT
+        elif self.checks % self.check_interval == 0:
+            if self.deadline != None and time.perf_counter() >= self.deadline:
+                self.status = TIMEOUT
+            elif self.cancel_event != None and self.cancel_event.is_set():
+                self.status = CANCELLED
+        return self.status != None
+
+    # Fills in squares using the rules of binary puzzles
+    def solve_manual(self):
+        start = time.perf_counter()
+        self.bitboard = BitBoard(self.solving_board)
+        self.propagator = Propagator(self.bitboard, self.step, self.instrument, self.log)
+        self.propagator.push_all()
+        possible = self.propagator.propagate()
+        if self.instrument != None:
+            self.instrument.phase(MANUAL, time.perf_counter() - start)
+
+        if possible:
+            start = time.perf_counter()
+            self.searching = True
+            if self.mode == LINES:
+                self.line_solve()
+            elif self.mode == SAT:
+                self.sat_solve()
+            else:
+                self.search()
+            if self.instrument != None:
+                self.instrument.phase(SEARCH, time.perf_counter() - start)
+
+    # Picks the next cell to guess and the order to try its values in, or None when the board is full
+    def next_guess(self):
+        if self.mode == BACKTRACK:
+            cell = self.bitboard.next_empty()
+            if cell == None:
+                return None
+            return cell[0], cell[1], (0, 1)
+
+        cell = self.bitboard.most_constrained()
+        if cell == None:
+            return None
+        return cell[0], cell[1], self.value_order(cell[0], cell[1])
+
+    # Searches for solutions with an explicit stack of guesses, so there is no recursion limit.
+    # BACKTRACK only checks the guessed cell, CONSTRAINED fills in everything each guess forces.
+    def search(self):
+        propagator = self.propagator
+        stack = self.stack
+        guess = self.next_guess()
+
+        while True:
+            if guess == None:
+                # full board, keeps searching after it until enough solutions are found
+                self.add_solution(self.bitboard.to_grid())
+                if len(self.solutions) >= self.solution_limit:
+                    return
+            else:
+                # each frame is [row, column, values to try, next value index, trail length before the guess]
+                stack.append([guess[0], guess[1], guess[2], 0, len(propagator.trail)])
+
+            # tries values until one is possible, backtracking when a cell runs out of values
+            while True:
+                if not stack:
+                    return # searched everything
+                if self.limit_reached(self.current_solve_iterations):
+                    return
+
+                frame = stack[-1]
+                row, column, values, index, trail_length = frame
+                propagator.undo(trail_length) # removes the previous value tried here and everything it forced
+                if index == len(values):
+                    stack.pop()
+                    continue
+                frame[3] += 1
+                self.current_solve_iterations += 1
+                if self.instrument != None:
+                    self.instrument.node(len(stack), row, column, values[index])
+
+                # tries new value
+                if self.mode == BACKTRACK:
+                    possible = propagator.place(row, column, values[index])
+                else:
+                    possible = propagator.assign(row, column, values[index]) and propagator.propagate()
+                if possible:
+                    break
+                self.backtracks += 1
+                if self.instrument != None:
+                    self.instrument.backtrack(len(stack))
+
+            guess = self.next_guess()
+
+    # Returns the parts of the search tree a cell search stopped by a budget hadn't reached, as grids that can be
+    # solved on their own. Their solutions and the ones already found are every solution of the puzzle, none twice.
+    def unexplored(self):
+        if self.mode not in (BACKTRACK, CONSTRAINED):
+            raise ValueError('Only the cell searches can hand out their unexplored parts, not ' + self.mode)
+        parts = []
+        if not self.searching or self.status not in (NODE_LIMIT, TIMEOUT, CANCELLED):
+            return parts
+
+        # shallowest guess first, its untried values hold the largest parts
+        trail = self.propagator.trail
+        board = copy.deepcopy(self.givens)
+        filled = 0
+        for row, column, values, index, trail_length in self.stack:
+            for row_filled, column_filled in trail[filled:trail_length]:
+                board[row_filled][column_filled] = self.bitboard.get(row_filled, column_filled)
+            filled = trail_length
+            for number in values[index:]:
+                part = [list(line) for line in board]
+                part[row][column] = str(number)
+                parts.append(part)
+        return parts
+
+    # Records a solution, the first one found is the solved board
+    def add_solution(self, board):
+        if not self.solved:
+            if self.log != None:
+                # the line and SAT searches don't fill in the board, their solution is logged in one go
+                for row in range(self.size):
+                    for column in range(self.size):
+                        if not self.bitboard.row_filled[row] >> column & 1:
+                            self.log.placed(row, column, int(board[row][column]))
+            self.solved = True
+            self.solving_board = board
+        self.solutions.append(board)
+        if self.instrument != None:
+            self.instrument.solution()
+
+    # Searches over whole legal lines instead of single cells
+    def line_solve(self):
+        line_solver = LineSolver(self.bitboard, self.limit_reached)
+        for rows in line_solver.solve(self.solution_limit):
+            self.add_solution(line_solver.to_grid(rows))
+        self.current_solve_iterations = line_solver.iterations
+        if self.instrument != None:
+            self.instrument.nodes += line_solver.iterations
+
+    # Encodes the board as propagation left it and solves it with the clause learning engine of sat.py
+    def sat_solve(self):
+        encoder = Encoder(self.bitboard.to_grid())
+        encoder.add_line_rules()
+        engine = CDCL(encoder.variable_count, encoder.clauses, self.size * self.size)
+        for model in solve_distinct(encoder, engine, self.limit_reached):
+            self.add_solution(decode(model, self.size))
+            if len(self.solutions) >= self.solution_limit:
+                break
+        self.current_solve_iterations = engine.decisions
+        self.backtracks = engine.conflicts
+        if self.instrument != None:
+            self.instrument.nodes += engine.decisions
+            self.instrument.backtracks += engine.conflicts
+
+    # Tries the digit the row still needs more of first
+    def value_order(self, row, column):
+        if self.rng != None:
+            return self.rng.choice(((0, 1), (1, 0)))
+        counts = self.bitboard.row_counts[row]
+        if counts[1] < counts[0]:
+            return (1, 0)
+        return (0, 1)
+
+    # Checks if the row and column of the last placed number follow the rules of binary puzzles
+    def possible(self, row, column):
+        return self.bitboard.possible(row, column)
@@ -0,0 +1,119 @@
+# custom library
+from bitboard import BitBoard
+from propagation import Propagator
+from instrumentation import PAIRS, COUNT, COMPLETIONS
+
+# rules a line can break
+TRIPLE = 'triple' # three of a digit in a row
+TOO_MANY = 'too_many' # more than half of one digit
+DUPLICATE = 'duplicate' # full and the same as another full line
+
+HINT_ORDER = (PAIRS, COUNT, COMPLETIONS) # simplest rule first, a hint uses the simplest one that forces a cell
+
+
+class MoveValidator():
+    '''Keeps the rules broken by each row and column of a player's grid up to date as cells change'''
+
+    def __init__(self, grid):
+        self.bitboard = BitBoard(grid)
+        self.size = self.bitboard.size
+        self.propagator = Propagator(self.bitboard) # only its line rules are used, it never fills anything in
+
+        self.empty_cells = sum([row.count(BitBoard.empty) for row in grid])
+        self.errors = [None] * (2 * self.size) # rule broken by each line (or None), rows are 0 to size-1 and columns are size to 2*size-1
+        self.broken = 0 # lines breaking a rule
+        self.check_lines(range(2 * self.size))
+
+    # Changes a cell to '_', '0' or '1' and returns the lines whose errors changed
+    def set(self, row, column, value):
+        bitboard = self.bitboard
+        old_value = bitboard.get(row, column)
+        if value == old_value:
+            return []
+
+        was_full = (bitboard.row_filled[row] == bitboard.full, bitboard.column_filled[column] == bitboard.full)
+        if old_value != BitBoard.empty:
+            bitboard.clear(row, column)
+            self.empty_cells += 1
+        if value != BitBoard.empty:
+            bitboard.set(row, column, int(value))
+            self.empty_cells -= 1
+
+        # a line filling up or emptying can make other lines duplicates or stop them being ones
+        lines = [row, self.size + column]
+        if was_full[0] or bitboard.row_filled[row] == bitboard.full:
+            lines.extend(range(self.size))
+        if was_full[1] or bitboard.column_filled[column] == bitboard.full:
+            lines.extend(range(self.size, 2 * self.size))
+        return self.check_lines(lines)
+
+    # Rechecks lines, returns the ones whose errors changed
+    def check_lines(self, lines):
+        changed = []
+        for line in lines:
+            error = self.line_error(line)
+            if error != self.errors[line]:
+                if self.errors[line] == None:
+                    self.broken += 1
+                elif error == None:
+                    self.broken -= 1
+                self.errors[line] = error
+                changed.append(line)
+        return changed
+
+    # Returns the rule a line breaks, or None
+    def line_error(self, line):
+        bitboard = self.bitboard
+        if line < self.size:
+            ones, filled, signatures = bitboard.row_ones[line], bitboard.row_filled[line], bitboard.complete_rows
+        else:
+            ones, filled, signatures = bitboard.column_ones[line - self.size], bitboard.column_filled[line - self.size], bitboard.complete_columns
+        zeros = filled & ~ones
+
+        if ones & (ones >> 1) & (ones >> 2) or zeros & (zeros >> 1) & (zeros >> 2):
+            return TRIPLE
+        if ones.bit_count() > bitboard.half or zeros.bit_count() > bitboard.half:
+            return TOO_MANY
+        if filled == bitboard.full and signatures[ones] > 1:
+            return DUPLICATE
+        return None
+
+    # Returns True if no line breaks a rule
+    def valid(self):
+        return self.broken == 0
+
+    # A full grid that breaks no rule is a solution, the givens can't have been changed
+    def solved(self):
+        return self.empty_cells == 0 and self.broken == 0
+
+    # Returns the next logical move as (row, column, value, rule) using only the rows and columns as they are,
+    # or None if no single line forces a cell (or the grid already breaks a rule)
+    def hint(self):
+        if self.broken:
+            return None
+
+        bitboard = self.bitboard
+        size = self.size
+        best = None
+        for line in range(2 * size):
+            if line < size:
+                forced = self.propagator.line_forced(bitboard.row_ones[line], bitboard.row_filled[line], bitboard.complete_rows)
+            else:
+                forced = self.propagator.line_forced(bitboard.column_ones[line - size], bitboard.column_filled[line - size], bitboard.complete_columns)
+            if forced == None or not (forced[0] or forced[1]):
+                continue
+
+            rank = HINT_ORDER.index(self.propagator.rule)
+            if best == None or rank < best[0]:
+                number = 0 if forced[0] else 1
+                position = (forced[number] & -forced[number]).bit_length() - 1
+                if line < size:
+                    best = (rank, line, position, str(number), self.propagator.rule)
+                else:
+                    best = (rank, position, line - size, str(number), self.propagator.rule)
+                if rank == 0:
+                    break
+
+        if best == None:
+            return None
+        return best[1:]
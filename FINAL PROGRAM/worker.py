@@ -0,0 +1,203 @@
+import sys
+import os
+import json
+import time
+import queue
+import threading
+import subprocess
+
+# custom library
+from solver import Solver, MODES, AUTO, CANCELLED
+from replay import MoveLog
+
+# Messages are JSON, one per line.
+# To the worker:
+#   {"type": "solve", "job": 1, "grid": [["_", "0", ...], ...], "mode": "constrained", "record": false}
+#   {"type": "cancel", "job": 1}  cancels that job and every earlier one
+# From the worker:
+#   {"type": "moves", "job": 1, "moves": [...]}  part of the MoveLog of a recorded job
+#   {"type": "done", "job": 1, "status": "solved", "board": [[...], ...] or null, "iterations": 7}
+#   {"type": "exit", "pid": 1234}  added by SolveWorker when the process has ended
+
+WORKER_PATH = os.path.abspath(__file__)
+FAILED = 'failed' # status of jobs lost when the worker process died
+MOVE_CHUNK = 4096 # moves sent in one message
+CANCEL_GRACE = 1 # seconds a cancelled solve has to stop before its process is killed
+
+
+class WorkerLoop():
+    '''Runs inside the worker process, solving one job at a time while a thread listens for cancels'''
+
+    def __init__(self, input, output):
+        self.input = input
+        self.output = output
+        self.jobs = queue.Queue()
+        self.cancelled = 0 # every job up to this one is cancelled
+
+    def run(self):
+        reader = threading.Thread(target = self.read, daemon = True)
+        reader.start()
+        while True:
+            message = self.jobs.get()
+            if message == None:
+                break
+            self.solve(message)
+
+    # Reads messages until the other end closes the pipe, which cancels everything
+    def read(self):
+        for line in self.input:
+            message = json.loads(line)
+            if message['type'] == 'solve':
+                self.jobs.put(message)
+            elif message['type'] == 'cancel':
+                self.cancelled = max(self.cancelled, message['job'])
+        self.cancelled = float('inf')
+        self.jobs.put(None)
+
+    def send(self, message):
+        self.output.write(json.dumps(message) + '\n')
+        self.output.flush()
+
+    def solve(self, message):
+        job = message['job']
+        log = MoveLog(len(message['grid'])) if message.get('record') else None
+        sent = [0] # moves of the log already sent
+
+        # sends the moves in chunks while solving, the rest once it finishes
+        def send_moves(solver):
+            if len(log) - sent[0] >= MOVE_CHUNK:
+                self.send({'type': 'moves', 'job': job, 'moves': log.moves[sent[0]:].tolist()})
+                sent[0] = len(log)
+
+        solver = Solver(message['grid'], send_moves if log != None else None, message.get('mode', AUTO),
+            cancel_event = JobCancel(self, job), log = log)
+        if job <= self.cancelled:
+            solver.status = CANCELLED
+        else:
+            solver.run()
+
+        if log != None and len(log) > sent[0]:
+            self.send({'type': 'moves', 'job': job, 'moves': log.moves[sent[0]:].tolist()})
+        self.send({
+            'type': 'done',
+            'job': job,
+            'status': solver.status,
+            'board': solver.solving_board if solver.solved else None,
+            'iterations': solver.current_solve_iterations,
+            })
+
+
+class JobCancel():
+    '''The cancel event the solver checks, set once the worker has been told to cancel the job'''
+
+    def __init__(self, worker_loop, job):
+        self.worker_loop = worker_loop
+        self.job = job
+
+    def is_set(self):
+        return self.job <= self.worker_loop.cancelled
+
+
+class SolveWorker():
+    '''Solves puzzles in a separate process, kept running so later solves don't pay to start it again'''
+
+    def __init__(self):
+        self.process = None
+        self.messages = queue.Queue() # filled by a thread reading the process output
+        self.job = 0
+        self.pending = {} # jobs sent and not done yet, mapped to the time they were cancelled (None if not)
+
+    # Starts the worker process if it isn't running
+    def start(self):
+        if self.process != None and self.process.poll() == None:
+            return
+        self.process = subprocess.Popen([sys.executable, WORKER_PATH], stdin = subprocess.PIPE, stdout = subprocess.PIPE, text = True, bufsize = 1)
+        self.pending = {}
+        reader = threading.Thread(target = self.read, args = (self.process,), daemon = True)
+        reader.start()
+
+    def read(self, process):
+        for line in process.stdout:
+            self.messages.put(json.loads(line))
+        self.messages.put({'type': 'exit', 'pid': process.pid})
+
+    def send(self, message):
+        try:
+            self.process.stdin.write(json.dumps(message) + '\n')
+            self.process.stdin.flush()
+        except OSError: # the process has died, the reader reports its exit
+            pass
+
+    # Queues a solve and returns its job number, messages about it come from poll()
+    def submit(self, grid, mode = AUTO, record = False):
+        if mode not in MODES:
+            raise ValueError('Unknown search mode: ' + str(mode))
+        self.kill_stuck()
+        self.start()
+        self.job += 1
+        self.pending[self.job] = None
+        self.send({'type': 'solve', 'job': self.job, 'grid': grid, 'mode': mode, 'record': record})
+        return self.job
+
+    # Cancels a job (by default every job so far), the worker answers with a 'cancelled' done message
+    def cancel(self, job = None):
+        if job == None:
+            job = self.job
+        now = time.perf_counter()
+        for pending_job in self.pending:
+            if pending_job <= job and self.pending[pending_job] == None:
+                self.pending[pending_job] = now
+        if self.process != None:
+            self.send({'type': 'cancel', 'job': job})
+
+    # Returns every message received since the last call, without waiting
+    def poll(self):
+        messages = []
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if message['type'] == 'done':
+                self.pending.pop(message['job'], None)
+            elif message['type'] == 'exit' and self.process != None and message['pid'] == self.process.pid:
+                self.kill(FAILED) # died by itself, its jobs will never finish
+            messages.append(message)
+        self.kill_stuck()
+        return messages
+
+    # Kills the process if a cancelled job has ignored the cancel for longer than CANCEL_GRACE
+    def kill_stuck(self):
+        now = time.perf_counter()
+        for cancel_time in self.pending.values():
+            if cancel_time != None and now - cancel_time > CANCEL_GRACE:
+                self.kill()
+                return
+
+    # Stops the process straight away, jobs still pending are reported with status
+    def kill(self, status = CANCELLED):
+        if self.process != None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+        for job in self.pending:
+            self.messages.put({'type': 'done', 'job': job, 'status': status, 'board': None, 'iterations': 0})
+        self.pending = {}
+
+    # Asks the process to finish and waits for it, killing it if it doesn't
+    def close(self, timeout = CANCEL_GRACE):
+        if self.process == None:
+            return
+        self.process.stdin.close() # cancels everything in the worker
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+
+if __name__ == "__main__":
+    output = sys.stdout
+    sys.stdout = sys.stderr # stray prints can't break the messages
+    WorkerLoop(sys.stdin, output).run()